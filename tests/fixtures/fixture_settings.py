@@ -0,0 +1,7 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def eager_background_tasks(settings):
+    # Фоновый поток пережил бы базу и временные каталоги теста.
+    settings.BACKGROUND_TASKS_EAGER = True
@@ -0,0 +1,317 @@
+"""Общий для всех процессов кэш в файле SQLite (WAL).
+
+LocMemCache у каждого воркера свой: с ростом числа воркеров кэш
+холодеет, а инвалидация в одном процессе не видна в других. Этот бэкенд
+хранит записи в одном файле SQLite в режиме WAL, поэтому его видят все
+процессы без внешнего сервиса. Перед файлом стоит небольшой кэш L1 в
+памяти процесса: повторные чтения в пределах L1_TIMEOUT секунд не
+доходят до SQLite. Запись, удаление и incr сбрасывают L1 своего процесса,
+в остальных процессах L1 может отставать не больше чем на L1_TIMEOUT.
+
+Настройки (OPTIONS):
+    MAX_ENTRIES — сколько записей хранить, лишние вытесняются по LRU;
+    CULL_EVERY — как часто (в записях) проверять переполнение;
+    L1_TIMEOUT, L1_MAX_ENTRIES — срок жизни и размер кэша L1;
+    BUSY_TIMEOUT — сколько секунд ждать блокировку файла.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS cache_entries (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires REAL,
+    accessed REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cache_entries_accessed
+    ON cache_entries (accessed);
+CREATE INDEX IF NOT EXISTS cache_entries_expires
+    ON cache_entries (expires);
+'''
+
+# Время последнего чтения обновляется не чаще, чем раз в столько секунд:
+# для LRU этой точности хватает, а чтения не превращаются в записи.
+ACCESS_RESOLUTION = 30
+
+
+class SQLiteCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._cull_every = int(options.get('CULL_EVERY', 100))
+        self._l1_timeout = float(options.get('L1_TIMEOUT', 1))
+        self._l1_max_entries = int(options.get('L1_MAX_ENTRIES', 1000))
+        self._busy_timeout = float(options.get('BUSY_TIMEOUT', 5))
+        self._local = threading.local()
+        self._l1 = OrderedDict()
+        self._l1_lock = threading.Lock()
+        self._writes = 0
+
+    # Соединения
+
+    def _connection(self):
+        """Соединение текущего потока; после fork открывается заново."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(
+                self._path,
+                timeout=self._busy_timeout,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @contextmanager
+    def _write(self):
+        """Транзакция с блокировкой на запись с самого начала."""
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    # L1
+
+    def _l1_get(self, key):
+        with self._l1_lock:
+            item = self._l1.get(key)
+            if item is None:
+                return None
+            value, deadline = item
+            if deadline <= time.time():
+                del self._l1[key]
+                return None
+            self._l1.move_to_end(key)
+            return value
+
+    def _l1_set(self, key, value, expires):
+        deadline = time.time() + self._l1_timeout
+        if expires is not None:
+            deadline = min(deadline, expires)
+        with self._l1_lock:
+            self._l1[key] = (value, deadline)
+            self._l1.move_to_end(key)
+            while len(self._l1) > self._l1_max_entries:
+                self._l1.popitem(last=False)
+
+    def _l1_discard(self, *keys):
+        with self._l1_lock:
+            for key in keys:
+                self._l1.pop(key, None)
+
+    # Служебное
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _dumps(self, value):
+        return pickle.dumps(value, self.pickle_protocol)
+
+    def _fetch(self, keys):
+        """Живые записи из файла: {key: (pickled, expires)}."""
+        now = time.time()
+        found = {}
+        stale = []
+        conn = self._connection()
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = conn.execute(
+                'SELECT key, value, expires, accessed FROM cache_entries '
+                'WHERE key IN (%s)' % ', '.join('?' * len(chunk)),
+                chunk,
+            ).fetchall()
+            for key, value, expires, accessed in rows:
+                if expires is not None and expires <= now:
+                    continue
+                found[key] = (value, expires)
+                if accessed < now - ACCESS_RESOLUTION:
+                    stale.append(key)
+        if stale:
+            conn.execute(
+                'UPDATE cache_entries SET accessed = ? WHERE key IN (%s)'
+                % ', '.join('?' * len(stale)),
+                [now, *stale],
+            )
+        return found
+
+    def _store(self, conn, key, value, timeout):
+        expires = self.get_backend_timeout(timeout)
+        conn.execute(
+            'INSERT OR REPLACE INTO cache_entries '
+            '(key, value, expires, accessed) VALUES (?, ?, ?, ?)',
+            (key, value, expires, time.time()),
+        )
+        return expires
+
+    def _cull(self, conn):
+        """Удаляет просроченные записи, затем самые давно читаемые."""
+        conn.execute(
+            'DELETE FROM cache_entries WHERE expires <= ?', (time.time(),)
+        )
+        (count,) = conn.execute(
+            'SELECT COUNT(*) FROM cache_entries'
+        ).fetchone()
+        if count > self._max_entries:
+            excess = count - self._max_entries
+            if self._cull_frequency:
+                excess = max(excess, count // self._cull_frequency)
+            conn.execute(
+                'DELETE FROM cache_entries WHERE key IN ('
+                'SELECT key FROM cache_entries ORDER BY accessed LIMIT ?)',
+                (excess,),
+            )
+
+    def _after_write(self, conn, count=1):
+        self._writes += count
+        if self._writes >= self._cull_every:
+            self._writes = 0
+            self._cull(conn)
+
+    # API кэша Django
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        value = self._l1_get(key)
+        if value is None:
+            found = self._fetch([key])
+            if key not in found:
+                return default
+            value, expires = found[key]
+            self._l1_set(key, value, expires)
+        return pickle.loads(value)
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        result = {}
+        missing = []
+        for key, original in keys.items():
+            value = self._l1_get(key)
+            if value is None:
+                missing.append(key)
+            else:
+                result[original] = pickle.loads(value)
+        if missing:
+            for key, (value, expires) in self._fetch(missing).items():
+                self._l1_set(key, value, expires)
+                result[keys[key]] = pickle.loads(value)
+        return result
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        value = self._dumps(value)
+        with self._write() as conn:
+            expires = self._store(conn, key, value, timeout)
+            self._after_write(conn)
+        self._l1_set(key, value, expires)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        pickled = {
+            self._key(key, version): self._dumps(value)
+            for key, value in data.items()
+        }
+        if not pickled:
+            return []
+        with self._write() as conn:
+            for key, value in pickled.items():
+                expires = self._store(conn, key, value, timeout)
+            self._after_write(conn, len(pickled))
+        for key, value in pickled.items():
+            self._l1_set(key, value, expires)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        value = self._dumps(value)
+        with self._write() as conn:
+            row = conn.execute(
+                'SELECT expires FROM cache_entries WHERE key = ?', (key,)
+            ).fetchone()
+            if row is not None and (row[0] is None or row[0] > time.time()):
+                return False
+            expires = self._store(conn, key, value, timeout)
+            self._after_write(conn)
+        self._l1_set(key, value, expires)
+        return True
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        with self._write() as conn:
+            updated = conn.execute(
+                'UPDATE cache_entries SET expires = ? '
+                'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                (self.get_backend_timeout(timeout), key, time.time()),
+            ).rowcount
+        self._l1_discard(key)
+        return bool(updated)
+
+    def incr(self, key, delta=1, version=None):
+        """Атомарно: чтение и запись в одной транзакции BEGIN IMMEDIATE."""
+        key = self._key(key, version)
+        with self._write() as conn:
+            row = conn.execute(
+                'SELECT value, expires FROM cache_entries WHERE key = ?',
+                (key,),
+            ).fetchone()
+            if row is None or (row[1] is not None and row[1] <= time.time()):
+                raise ValueError("Key '%s' not found" % key)
+            new_value = pickle.loads(row[0]) + delta
+            conn.execute(
+                'UPDATE cache_entries SET value = ? WHERE key = ?',
+                (self._dumps(new_value), key),
+            )
+        self._l1_discard(key)
+        return new_value
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        return self._l1_get(key) is not None or bool(self._fetch([key]))
+
+    def delete(self, key, version=None):
+        key = self._key(key, version)
+        with self._write() as conn:
+            conn.execute('DELETE FROM cache_entries WHERE key = ?', (key,))
+        self._l1_discard(key)
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        with self._write() as conn:
+            conn.executemany(
+                'DELETE FROM cache_entries WHERE key = ?',
+                [(key,) for key in keys],
+            )
+        self._l1_discard(*keys)
+
+    def clear(self):
+        with self._write() as conn:
+            conn.execute('DELETE FROM cache_entries')
+        with self._l1_lock:
+            self._l1.clear()
+
+    def close(self, **kwargs):
+        # Соединение держим открытым между запросами: открывать файл на
+        # каждый запрос дороже, чем сама работа с кэшем.
+        pass
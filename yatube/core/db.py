@@ -0,0 +1,44 @@
+"""Настройка соединений с SQLite.
+
+Django открывает файл базы с журналом по умолчанию (rollback journal):
+пока пишет post_create или add_comment, читатели ждут. Обработчик
+connection_created выполняет PRAGMA из settings.SQLITE_PRAGMAS на каждом
+новом соединении; в рабочем профиле это WAL, mmap и busy_timeout, при
+которых читатели не блокируются писателем.
+"""
+import sqlite3
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+
+def apply_pragmas(cursor, pragmas):
+    for name, value in pragmas.items():
+        cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', None)
+    if connection.vendor == 'sqlite' and pragmas:
+        with connection.cursor() as cursor:
+            apply_pragmas(cursor, pragmas)
+
+
+def connect():
+    connection_created.connect(
+        configure_sqlite, dispatch_uid='core.db.configure_sqlite'
+    )
+
+
+def copy_database(connection, path):
+    """Копирует базу соединения в файл path через backup API SQLite.
+
+    Копия делается за один шаг и под блокировкой файла-получателя, так что
+    читатели реплики видят либо старое, либо новое состояние целиком.
+    """
+    connection.ensure_connection()
+    target = sqlite3.connect(path)
+    try:
+        connection.connection.backup(target)
+    finally:
+        target.close()
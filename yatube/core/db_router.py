@@ -0,0 +1,89 @@
+"""Чтение с реплики, запись в основную базу.
+
+Представления, помеченные ``@read_replica``, читают из алиаса
+``replica``, всё остальное — из ``default``. Реплика отстаёт от основной
+базы не больше чем на REPLICA_LAG секунд, поэтому:
+
+* после любого изменяющего запроса (пост, комментарий, подписка)
+  пользователь получает cookie и REPLICA_LAG секунд читает с основной
+  базы — он сразу видит то, что сам написал;
+* сессии всегда читаются с основной базы: только что созданная сессия
+  могла ещё не попасть на реплику.
+
+Если алиаса ``replica`` в DATABASES нет, роутер ничего не меняет.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+PRIMARY = 'default'
+REPLICA = 'replica'
+PIN_COOKIE = 'read_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+PRIMARY_ONLY_APPS = {'sessions'}
+
+_read_alias = ContextVar('read_alias', default=None)
+
+
+def read_replica(view_func):
+    """Помечает представление как читающее только с реплики."""
+    view_func.use_replica = True
+    return view_func
+
+
+@contextmanager
+def reading_from(alias):
+    token = _read_alias.set(alias)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if (
+            alias is None
+            or alias not in settings.DATABASES
+            or model._meta.app_label in PRIMARY_ONLY_APPS
+        ):
+            return None
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Реплика — копия основной базы, её схему приносит синхронизация.
+        return db == PRIMARY
+
+
+class ReplicaMiddleware:
+    """Направляет чтения помеченных представлений на реплику."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            response = self.get_response(request)
+        finally:
+            token = getattr(request, '_read_alias_token', None)
+            if token is not None:
+                _read_alias.reset(token)
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=settings.REPLICA_LAG, httponly=True
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if getattr(view_func, 'use_replica', False) and (
+            PIN_COOKIE not in request.COOKIES
+        ):
+            request._read_alias_token = _read_alias.set(REPLICA)
@@ -0,0 +1,76 @@
+from django.db import models
+
+
+class DerivedFieldMixin:
+    """Значение поля вычисляется из другого поля модели при сохранении.
+
+    derive — функция, получающая значение поля source; если source —
+    кортеж имён, derive получает значения этих полей по порядку. Поля
+    считаются в pre_save в порядке объявления, так что источником может
+    быть и производное поле, объявленное выше. Значение заполняет и
+    bulk_create. В миграциях поле выглядит обычной колонкой без source и
+    derive.
+    """
+
+    def __init__(self, *args, source=None, derive=None, **kwargs):
+        self.source = source
+        self.derive = derive
+        kwargs.setdefault('editable', False)
+        kwargs.setdefault('blank', True)
+        super().__init__(*args, **kwargs)
+
+    def pre_save(self, model_instance, add):
+        if isinstance(self.source, tuple):
+            value = self.derive(*(
+                getattr(model_instance, name) for name in self.source
+            ))
+        else:
+            value = self.derive(getattr(model_instance, self.source))
+        setattr(model_instance, self.attname, value)
+        return value
+
+    def deconstruct(self):
+        # В миграциях поле — обычная колонка базового типа: ссылка на
+        # derive из кода приложения сломала бы старые миграции после
+        # переименования функции, а пересчёт в них пишется явно.
+        name, path, args, kwargs = super().deconstruct()
+        base = next(
+            cls for cls in type(self).__mro__
+            if issubclass(cls, models.Field)
+            and not issubclass(cls, DerivedFieldMixin)
+        )
+        return name, f'django.db.models.{base.__name__}', args, kwargs
+
+
+class DerivedTextField(DerivedFieldMixin, models.TextField):
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('default', '')
+        super().__init__(*args, **kwargs)
+
+
+class DerivedIntegerField(DerivedFieldMixin, models.PositiveSmallIntegerField):
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('default', 0)
+        super().__init__(*args, **kwargs)
+
+
+def derived_fields(model):
+    return [
+        field for field in model._meta.concrete_fields
+        if isinstance(field, DerivedFieldMixin)
+    ]
+
+
+class FullTextField(models.TextField):
+    """Колонка полнотекстового индекса SQLite FTS5."""
+
+
+@FullTextField.register_lookup
+class Match(models.Lookup):
+    """field__match='запрос' — условие MATCH по индексу FTS5."""
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', lhs_params + rhs_params
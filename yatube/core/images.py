@@ -0,0 +1,52 @@
+"""Сведения о картинке для вёрстки без чтения файла при рендере."""
+import base64
+import io
+
+from django.conf import settings
+from PIL import Image
+
+
+class ImageInfo:
+    """Размеры, основной цвет и крошечное превью (LQIP) картинки."""
+
+    def __init__(self, width, height, color, lqip):
+        self.width = width
+        self.height = height
+        self.color = color
+        self.lqip = lqip
+
+
+def dominant_color(image):
+    """Самый частый цвет после сведения палитры к нескольким цветам."""
+    palette_image = image.quantize(colors=8)
+    count, index = max(palette_image.getcolors())
+    red, green, blue = palette_image.getpalette()[index * 3:index * 3 + 3]
+    return f'#{red:02x}{green:02x}{blue:02x}'
+
+
+def lqip(image):
+    """Превью как data URI JPEG для фона на время загрузки картинки."""
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=settings.IMAGE_LQIP_QUALITY)
+    data = base64.b64encode(buffer.getvalue()).decode()
+    return f'data:image/jpeg;base64,{data}'
+
+
+def describe(file):
+    """ImageInfo для открытого файла картинки.
+
+    JPEG декодируется в режиме draft сразу в уменьшенном масштабе, поэтому
+    полный кадр в памяти не распаковывается. Позиция файла возвращается в
+    начало: его ещё сохранять в хранилище.
+    """
+    size = settings.IMAGE_LQIP_SIZE
+    file.seek(0)
+    try:
+        with Image.open(file) as image:
+            width, height = image.size
+            image.draft('RGB', (size, size))
+            preview = image.convert('RGB')
+        preview.thumbnail((size, size))
+    finally:
+        file.seek(0)
+    return ImageInfo(width, height, dominant_color(preview), lqip(preview))
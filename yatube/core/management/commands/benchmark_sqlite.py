@@ -0,0 +1,143 @@
+"""Нагрузочное сравнение профилей SQLite: по умолчанию и рабочего.
+
+Несколько потоков-читателей выбирают страницу ленты, потоки-писатели
+добавляют посты. Профиль «default» повторяет настройки Django из коробки:
+журнал отката и новое соединение на каждый запрос. Профиль «production» —
+PRAGMA из SQLITE_PRODUCTION_PRAGMAS и постоянные соединения.
+"""
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.db import apply_pragmas
+
+SCHEMA = '''
+CREATE TABLE post (
+    id INTEGER PRIMARY KEY,
+    author_id INTEGER NOT NULL,
+    pub_date REAL NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX post_date_idx ON post (pub_date DESC, id DESC);
+'''
+READ_SQL = (
+    'SELECT id, author_id, text FROM post '
+    'ORDER BY pub_date DESC, id DESC LIMIT 10'
+)
+WRITE_SQL = 'INSERT INTO post (author_id, pub_date, text) VALUES (?, ?, ?)'
+
+
+class Profile:
+    def __init__(self, path, pragmas, persistent):
+        self.path = path
+        self.pragmas = pragmas
+        self.persistent = persistent
+
+    def connect(self):
+        # Как и Django, оставляем модулю sqlite3 ожидание блокировки 5 с.
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        apply_pragmas(conn, self.pragmas)
+        return conn
+
+
+def read(conn):
+    conn.execute(READ_SQL).fetchall()
+
+
+def write(conn):
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        conn.execute(WRITE_SQL, (1, time.time(), 'новый пост'))
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+    conn.execute('COMMIT')
+
+
+def worker(profile, operation, stop, results):
+    """Выполняет operation до сигнала stop; итог дописывает в results."""
+    done = locked = 0
+    conn = profile.connect() if profile.persistent else None
+    while not stop.is_set():
+        current = conn or profile.connect()
+        try:
+            operation(current)
+            done += 1
+        except sqlite3.OperationalError:
+            locked += 1
+        finally:
+            if conn is None:
+                current.close()
+    if conn is not None:
+        conn.close()
+    results.append((operation, done, locked))
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает пропускную способность SQLite при конкурентных '
+            'чтении и записи для профиля по умолчанию и рабочего.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--seconds', type=float, default=3)
+        parser.add_argument('--rows', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        profiles = {
+            'default': ({}, False),
+            'production': (settings.SQLITE_PRODUCTION_PRAGMAS, True),
+        }
+        self.stdout.write(
+            f'{"профиль":<12}{"чтений/с":>12}{"записей/с":>12}'
+            f'{"блокировок":>12}'
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            for name, (pragmas, persistent) in profiles.items():
+                profile = Profile(
+                    os.path.join(directory, f'{name}.sqlite3'),
+                    pragmas, persistent,
+                )
+                self.prepare(profile, options['rows'])
+                reads, writes, locked = self.run(profile, options)
+                seconds = options['seconds']
+                self.stdout.write(
+                    f'{name:<12}{reads / seconds:>12.0f}'
+                    f'{writes / seconds:>12.0f}{locked:>12}'
+                )
+
+    def prepare(self, profile, rows):
+        conn = profile.connect()
+        conn.executescript(SCHEMA)
+        conn.execute('BEGIN')
+        conn.executemany(
+            WRITE_SQL,
+            ((i % 50, time.time() + i, 'текст ' * 50) for i in range(rows)),
+        )
+        conn.execute('COMMIT')
+        conn.close()
+
+    def run(self, profile, options):
+        stop = threading.Event()
+        results = []
+        threads = [
+            threading.Thread(target=worker, args=(profile, op, stop, results))
+            for op, count in ((read, options['readers']),
+                              (write, options['writers']))
+            for _ in range(count)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(options['seconds'])
+        stop.set()
+        for thread in threads:
+            thread.join()
+        reads = sum(done for op, done, _ in results if op is read)
+        writes = sum(done for op, done, _ in results if op is write)
+        locked = sum(count for _, _, count in results)
+        return reads, writes, locked
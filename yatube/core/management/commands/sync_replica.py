@@ -0,0 +1,36 @@
+"""Синхронизация локальной реплики с основной базой."""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core.db import copy_database
+from core.db_router import PRIMARY, REPLICA
+
+
+class Command(BaseCommand):
+    help = ('Копирует основную базу SQLite в файл реплики через backup '
+            'API. С --interval повторяет копирование в цикле.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Пауза между копиями в секундах; должна быть меньше '
+                 'REPLICA_LAG. 0 — скопировать один раз.',
+        )
+
+    def handle(self, *args, **options):
+        if REPLICA not in settings.DATABASES:
+            raise CommandError('В DATABASES нет алиаса replica.')
+        path = settings.DATABASES[REPLICA]['NAME']
+        interval = options['interval']
+        while True:
+            started = time.monotonic()
+            copy_database(connections[PRIMARY], path)
+            self.stdout.write(
+                f'Реплика обновлена за {time.monotonic() - started:.2f} с.'
+            )
+            if not interval:
+                return
+            time.sleep(interval)
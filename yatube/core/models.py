@@ -11,3 +11,30 @@ class CreatedModel(models.Model):
 
     class Meta:
         abstract = True
+
+
+class CountersModel(models.Model):
+    """Абстрактная модель с денормализованными счётчиками.
+
+    Счётчики из counter_fields меняются только через UPDATE x = x + n.
+    Обычный save() существующей строки их не пишет, иначе сохранение
+    экземпляра, загруженного раньше, затёрло бы сдвиги после загрузки.
+    """
+    counter_fields = ()
+
+    class Meta:
+        abstract = True
+
+    def save(self, force_insert=False, force_update=False, using=None,
+             update_fields=None):
+        if update_fields is None and not (
+            force_insert or self._state.adding
+        ):
+            deferred = self.get_deferred_fields()
+            update_fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.attname not in deferred
+                and field.name not in self.counter_fields
+            ]
+        super().save(force_insert, force_update, using, update_fields)
@@ -0,0 +1,264 @@
+"""Кэш страниц с версионированными ключами и персональными «дырами».
+
+Каждая страница зависит от набора «областей» (scopes), например
+``index`` или ``group:<slug>``. У области есть версия — метка времени
+последнего изменения, которая входит в ключ кэша. Сигналы моделей
+сдвигают версию, и следующий запрос уже не находит старую страницу,
+поэтому кэшировать можно надолго без риска показать устаревшие данные.
+
+Страница кэшируется одна на всех: всё, что зависит от пользователя
+(шапка, кнопки подписки, форма комментария), выводится тегом
+``{% hole %}`` и в кэш попадает меткой. На каждый запрос метки заменяются
+фрагментами, отрендеренными для текущего пользователя.
+"""
+import base64
+import hashlib
+import json
+import math
+import random
+import re
+import time
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.utils.cache import patch_response_headers
+from django.utils.safestring import mark_safe
+from django.views.decorators.http import condition
+
+from .db_router import PRIMARY, reading_from
+
+HOLE_RE = re.compile(r'<!--hole:([A-Za-z0-9_-]+)-->')
+LOCK_POLL_INTERVAL = 0.05
+
+VERSION_KEY_PREFIX = 'page-version:'
+
+
+def _version_key(scope):
+    # Слаги и имена пользователей бывают не ASCII — в ключ идёт хэш.
+    return VERSION_KEY_PREFIX + hashlib.md5(scope.encode()).hexdigest()
+
+
+def get_versions(scopes):
+    """Версии областей; отсутствующие в кэше получают новую метку.
+
+    Метка живёт PAGE_VERSION_TIMEOUT: после её истечения новая метка лишь
+    сделает недоступными старые страницы области.
+    """
+    keys = [_version_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, settings.PAGE_VERSION_TIMEOUT)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def bump(*scopes):
+    """Сдвигает версии областей: их страницы в кэше становятся недоступны."""
+    now = time.time_ns()
+    cache.set_many(
+        {_version_key(scope): now for scope in scopes if scope},
+        settings.PAGE_VERSION_TIMEOUT,
+    )
+
+
+def is_punching(request):
+    return getattr(request, '_punch_holes', False)
+
+
+def punch_hole(template_name, params):
+    """Метка на месте персонального фрагмента в кэшируемой странице."""
+    payload = json.dumps(
+        [template_name, params], default=str, separators=(',', ':')
+    )
+    token = base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+    return mark_safe(f'<!--hole:{token}-->')
+
+
+def fill_holes(content, request):
+    """Заменяет метки фрагментами для пользователя текущего запроса."""
+    def render_hole(match):
+        token = match.group(1)
+        payload = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        template_name, params = json.loads(payload.decode())
+        return render_to_string(template_name, params, request=request)
+    return HOLE_RE.sub(render_hole, content)
+
+
+def _page_key(request, versions):
+    raw = '.'.join(str(v) for v in versions) + request.get_full_path()
+    return 'page:' + hashlib.md5(raw.encode()).hexdigest()
+
+
+def _lock_key(cache_key):
+    return cache_key + ':lock'
+
+
+def _needs_refresh(fresh_until, build_time, beta):
+    """Истекла ли свежесть, с вероятностным ранним обновлением (XFetch).
+
+    Чем дольше страница собирается и чем ближе конец свежести, тем выше
+    шанс, что один из запросов обновит её заранее, до общего истечения.
+    """
+    now = time.time()
+    if beta:
+        now -= build_time * beta * math.log(1.0 - random.random())
+    return now >= fresh_until
+
+
+def _wait_for_entry(cache_key, wait):
+    """Ждёт, пока страницу соберёт запрос, который держит блокировку."""
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        entry = cache.get(cache_key)
+        if entry is not None:
+            return entry
+    return None
+
+
+def _cached_response(entry, request):
+    content, content_type = entry[:2]
+    response = HttpResponse(
+        fill_holes(content, request), content_type=content_type
+    )
+    patch_response_headers(response, 0)
+    return response
+
+
+def _acquire(lock_key):
+    return cache.add(lock_key, True, settings.PAGE_CACHE_LOCK_TIMEOUT)
+
+
+def _lookup(cache_key, lock_key):
+    """Запись, которую можно отдать, и взята ли блокировка на пересборку.
+
+    Свежая запись отдаётся как есть. Устаревшую пересобирает тот, кто
+    взял блокировку, остальные получают устаревшую копию. При промахе
+    без блокировки ждём, пока страницу соберёт её владелец.
+    """
+    entry = cache.get(cache_key)
+    if entry is not None:
+        refresh = _needs_refresh(
+            *entry[2:], settings.PAGE_CACHE_EARLY_REFRESH_BETA
+        )
+        if refresh and _acquire(lock_key):
+            return None, True
+        return entry, False
+    if _acquire(lock_key):
+        return None, True
+    return _wait_for_entry(cache_key, settings.PAGE_CACHE_LOCK_WAIT), False
+
+
+def _build(view_func, cache_key, request, *args, **kwargs):
+    """Собирает страницу с метками, кладёт в кэш и заполняет метки."""
+    started = time.monotonic()
+    request._punch_holes = True
+    try:
+        response = view_func(request, *args, **kwargs)
+    finally:
+        request._punch_holes = False
+    if response.streaming:
+        return response
+    content = response.content.decode(response.charset)
+    if response.status_code == 200:
+        timeout = settings.PAGE_CACHE_TIMEOUT
+        entry = (
+            content,
+            response['Content-Type'],
+            time.time() + timeout,
+            time.monotonic() - started,
+        )
+        cache.set(
+            cache_key, entry, timeout + settings.PAGE_CACHE_STALE_TIMEOUT
+        )
+    response.content = fill_holes(content, request)
+    patch_response_headers(response, 0)
+    return response
+
+
+def _build_source(versions):
+    """Недавно изменённые области собираются по основной базе.
+
+    Реплика может ещё не знать о последнем изменении, а собранная с неё
+    страница легла бы в кэш под новой версией и пережила бы отставание.
+    """
+    changed_ago = time.time_ns() - max(versions, default=0)
+    if changed_ago < settings.REPLICA_LAG * 1e9:
+        return reading_from(PRIMARY)
+    return nullcontext()
+
+
+def cache_page_versioned(scopes):
+    """Замена cache_page: версионированные ключи, stale-while-revalidate.
+
+    scopes — функция с сигнатурой представления, возвращающая список
+    областей, от которых зависит страница. В кэш попадает общая для всех
+    пользователей страница с метками, персональные фрагменты
+    дорисовываются на каждый запрос.
+
+    Страница свежая PAGE_CACHE_TIMEOUT секунд, затем ещё
+    PAGE_CACHE_STALE_TIMEOUT отдаётся устаревшей, пока её пересобирает
+    ровно один запрос — тот, что взял блокировку в кэше. Остальные при
+    промахе ждут его результат не дольше PAGE_CACHE_LOCK_WAIT, а потом
+    собирают страницу сами.
+
+    Если область менялась последние REPLICA_LAG секунд, страница
+    собирается по основной базе, а не по реплике.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view_func(request, *args, **kwargs)
+            versions = get_versions(scopes(request, *args, **kwargs))
+            cache_key = _page_key(request, versions)
+            lock_key = _lock_key(cache_key)
+            entry, locked = _lookup(cache_key, lock_key)
+            if entry is not None:
+                return _cached_response(entry, request)
+            try:
+                with _build_source(versions):
+                    return _build(
+                        view_func, cache_key, request, *args, **kwargs
+                    )
+            finally:
+                if locked:
+                    cache.delete(lock_key)
+        return wrapper
+    return decorator
+
+
+def conditional_page(scopes):
+    """ETag и Last-Modified из версий областей, 304 без рендеринга.
+
+    Версия области — время её последнего изменения, поэтому валидаторы
+    считаются по кэшу без запросов к базе. В ETag входят пользователь и
+    его CSRF-токен: персональные фрагменты у всех разные, а после нового
+    входа старая форма с прежним токеном получила бы 403. Last-Modified
+    одинаков для всех, поэтому отдаётся только анонимам.
+    """
+    def etag(request, *args, **kwargs):
+        versions = get_versions(scopes(request, *args, **kwargs))
+        user = getattr(request, 'user', None)
+        raw = '{}:{}:{}:{}'.format(
+            '.'.join(str(v) for v in versions),
+            user.pk if user is not None else None,
+            request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+            request.get_full_path(),
+        )
+        return hashlib.md5(raw.encode()).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return None
+        versions = get_versions(scopes(request, *args, **kwargs))
+        return datetime.fromtimestamp(max(versions) / 1e9, tz=timezone.utc)
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
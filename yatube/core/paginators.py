@@ -0,0 +1,223 @@
+import base64
+import binascii
+import json
+from collections.abc import Sequence
+from datetime import datetime
+
+from django.core.exceptions import (
+    FieldDoesNotExist, FieldError, ValidationError,
+)
+from django.core.paginator import Paginator
+from django.db.models import DateTimeField, Max, Min, Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+def encode_cursor(direction, values):
+    """Упаковывает направление и значения ключа в непрозрачную строку."""
+    payload = [direction, [
+        {'dt': value.isoformat()} if isinstance(value, datetime) else value
+        for value in values
+    ]]
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Возвращает (направление, значения) или None для битого курсора."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(raw.decode())
+    except (binascii.Error, ValueError, TypeError, UnicodeDecodeError):
+        return None
+    if not isinstance(payload, list) or len(payload) != 2:
+        return None
+    direction, values = payload
+    if direction not in (NEXT, PREVIOUS) or not isinstance(values, list):
+        return None
+    try:
+        return direction, [_decode_value(value) for value in values]
+    except (TypeError, ValueError):
+        return None
+
+
+def _decode_value(value):
+    if isinstance(value, list):
+        raise TypeError('Вложенный список в курсоре.')
+    if not isinstance(value, dict):
+        return value
+    # Не строка или несуществующая дата вроде 2020-13-45 — ошибка.
+    date = parse_datetime(value.get('dt'))
+    if date is None:
+        raise ValueError('Неверная дата в курсоре.')
+    return date
+
+
+def estimate_count(model):
+    """Оценка числа строк по диапазону первичного ключа без COUNT(*).
+
+    MIN/MAX по первичному ключу — два поиска по индексу, а не проход по
+    таблице; дыры от удалённых строк делают оценку завышенной.
+    """
+    bounds = model._default_manager.order_by().aggregate(
+        low=Min('pk'), high=Max('pk')
+    )
+    if bounds['high'] is None:
+        return 0
+    return bounds['high'] - bounds['low'] + 1
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator, который берёт общее число объектов из get_count().
+
+    get_count — вызываемый объект без аргументов, обычно читающий
+    счётчик из кэша, чтобы страницы не делали COUNT(*) на каждый запрос.
+    """
+
+    def __init__(self, object_list, per_page, get_count, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.get_count = get_count
+
+    @cached_property
+    def count(self):
+        return self.get_count()
+
+
+class CursorPage(Sequence):
+    """Страница keyset-пагинации: знает только соседей, но не общее число."""
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return '<Cursor page of %s items>' % len(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if not self._has_next:
+            return ''
+        return self.paginator.cursor_for(self.object_list[-1], NEXT)
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous or not self.object_list:
+            return ''
+        return self.paginator.cursor_for(self.object_list[0], PREVIOUS)
+
+
+class CursorPaginator:
+    """Keyset-пагинация по упорядоченному набору полей.
+
+    Вместо OFFSET и COUNT(*) страница выбирается условием «строго после
+    последней показанной записи», поэтому любая глубина листания стоит
+    столько же, сколько первая страница.
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-id')):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+
+    @property
+    def fields(self):
+        return [name.lstrip('-') for name in self.ordering]
+
+    def cursor_for(self, obj, direction):
+        return encode_cursor(
+            direction, [getattr(obj, name) for name in self.fields]
+        )
+
+    def _field(self, name):
+        """Поле модели или output_field аннотации; None, если неизвестно."""
+        try:
+            return self.object_list.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            pass
+        annotation = self.object_list.query.annotations.get(name)
+        try:
+            return annotation.output_field
+        except (AttributeError, FieldError):
+            return None
+
+    def _clean(self, values):
+        """Значения ключа из курсора, приведённые к типам полей.
+
+        Поле даты (и аннотация с датой, как feed_date ленты) принимает
+        только дату, остальные поля — то, что принимает их to_python;
+        аннотации неизвестного типа — только числа. Для чужих значений —
+        ValueError, TypeError или ValidationError.
+        """
+        if len(values) != len(self.ordering):
+            raise ValueError('Длина курсора не совпадает с ключом.')
+        cleaned = []
+        for name, value in zip(self.fields, values):
+            field = self._field(name)
+            is_date = isinstance(field, DateTimeField)
+            if is_date != isinstance(value, datetime):
+                raise TypeError(f'Неверный тип значения {name}.')
+            if field is None:
+                if isinstance(value, bool) or not isinstance(
+                    value, (int, float)
+                ):
+                    raise TypeError(f'Неверный тип значения {name}.')
+                cleaned.append(value)
+            else:
+                cleaned.append(field.to_python(value))
+        return cleaned
+
+    def _seek(self, values, backwards):
+        """Условие «после/до записи со значениями ключа values»."""
+        condition = Q()
+        equal = Q()
+        for name, value in zip(self.ordering, values):
+            field = name.lstrip('-')
+            descending = name.startswith('-') != backwards
+            lookup = 'lt' if descending else 'gt'
+            condition |= equal & Q(**{f'{field}__{lookup}': value})
+            equal &= Q(**{field: value})
+        return condition
+
+    def get_page(self, cursor=None):
+        decoded = decode_cursor(cursor) if cursor else None
+        queryset = self.object_list.order_by(*self.ordering)
+        if decoded is not None:
+            try:
+                queryset = queryset.filter(self._seek(
+                    self._clean(decoded[1]), decoded[0] == PREVIOUS
+                ))
+            except (TypeError, ValueError, ValidationError):
+                # Подделанный курсор — как битый: первая страница.
+                decoded = None
+                queryset = self.object_list.order_by(*self.ordering)
+        backwards = decoded is not None and decoded[0] == PREVIOUS
+        if backwards:
+            queryset = queryset.reverse()
+        items = list(queryset[:self.per_page + 1])
+        has_more = len(items) > self.per_page
+        items = items[:self.per_page]
+        if backwards:
+            items.reverse()
+            return CursorPage(items, self, True, has_more)
+        return CursorPage(items, self, has_more, decoded is not None)
@@ -0,0 +1,68 @@
+"""Бюджет SQL-запросов на представление.
+
+Представление объявляет, сколько запросов ему можно сделать, декоратором
+``@query_budget(n)``. QueryBudgetMiddleware считает запросы каждого
+запроса к сайту и пишет предупреждение (или падает, если включён
+QUERY_BUDGET_RAISE), когда представление вышло за бюджет. Запросы
+считаются по всем базам, включая реплику. Для тестов есть
+core.testing.QueryBudgetTestMixin: он проверяет тот же бюджет через
+test client.
+"""
+import logging
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_budget(limit):
+    """Объявляет, сколько SQL-запросов может сделать представление."""
+    def decorator(view_func):
+        view_func.query_budget = limit
+        return view_func
+    return decorator
+
+
+def get_budget(view_func):
+    return getattr(view_func, 'query_budget', None)
+
+
+class QueryBudgetMiddleware:
+    """Следит за бюджетом запросов; включается в режиме отладки."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = _Counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = self.get_response(request)
+        budget = getattr(request, '_query_budget', None)
+        if budget is not None and counter.count > budget:
+            message = '%s: %d SQL-запросов при бюджете %d' % (
+                request.path, counter.count, budget
+            )
+            if getattr(settings, 'QUERY_BUDGET_RAISE', False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._query_budget = get_budget(view_func)
+
+
+class _Counter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
@@ -0,0 +1,70 @@
+"""Потоковая отдача больших ответов без накопления в памяти."""
+import zipfile
+
+BUFFER_SIZE = 64 * 1024
+
+
+class Echo:
+    """Псевдофайл для csv.writer: write() возвращает записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def buffered(chunks, size=BUFFER_SIZE):
+    """Склеивает мелкие куски (str или bytes) в блоки не меньше size."""
+    parts = []
+    length = 0
+    for chunk in chunks:
+        parts.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield parts[0][:0].join(parts)
+            parts = []
+            length = 0
+    if parts:
+        yield parts[0][:0].join(parts)
+
+
+class _ZipBuffer:
+    """Поток без seek для ZipFile: копит байты, пока их не заберут."""
+
+    def __init__(self):
+        self.parts = []
+        self.size = 0
+        self.offset = 0
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.size += len(data)
+        self.offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.offset
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self.parts)
+        self.parts = []
+        self.size = 0
+        return data
+
+
+def stream_zip(entries, size=BUFFER_SIZE):
+    """Zip-архив, который отдаётся кусками по мере сборки.
+
+    entries — пары (имя файла, итерируемое кусков bytes). Размеры файлов
+    заранее не нужны: ZipFile без seek пишет их в дескриптор после данных.
+    """
+    buffer = _ZipBuffer()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, chunks in entries:
+            with archive.open(name, 'w', force_zip64=True) as entry:
+                for chunk in chunks:
+                    entry.write(chunk)
+                    if buffer.size >= size:
+                        yield buffer.take()
+    yield buffer.take()
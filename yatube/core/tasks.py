@@ -0,0 +1,65 @@
+"""Фоновые задачи в пуле потоков текущего процесса.
+
+Задача ставится в пул только после коммита текущей транзакции: фоновый
+поток не должен увидеть данные раньше, чем они сохранены. Одинаковая
+задача (функция и аргументы), которая ещё ждёт или выполняется, второй
+раз не ставится. Очередь живёт в памяти процесса, поэтому всё, что в ней
+теряется при перезапуске, должно уметь восстановиться само. С
+BACKGROUND_TASKS_EAGER задача выполняется сразу в текущем потоке.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.BACKGROUND_WORKERS,
+                thread_name_prefix='background',
+            )
+        return _executor
+
+
+def _call(func, args):
+    try:
+        func(*args)
+    except Exception:
+        logger.exception('Фоновая задача %s%r упала', func.__name__, args)
+
+
+def _run(key, func, args):
+    try:
+        _call(func, args)
+    finally:
+        with _lock:
+            _pending.discard(key)
+        connections.close_all()
+
+
+def _submit(func, args):
+    if settings.BACKGROUND_TASKS_EAGER:
+        _call(func, args)
+        return
+    key = (func, args)
+    with _lock:
+        if key in _pending:
+            return
+        _pending.add(key)
+    _get_executor().submit(_run, key, func, args)
+
+
+def submit(func, *args):
+    """Выполняет func(*args) в фоне после коммита текущей транзакции."""
+    transaction.on_commit(lambda: _submit(func, args))
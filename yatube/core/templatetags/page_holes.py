@@ -0,0 +1,20 @@
+from django import template
+
+from core.page_cache import is_punching, punch_hole
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def hole(context, template_name, **kwargs):
+    """Персональный фрагмент страницы.
+
+    При сборке страницы для кэша вместо фрагмента ставится метка, которую
+    заполняют для каждого запроса отдельно; в остальных случаях фрагмент
+    рендерится на месте, как include.
+    """
+    if is_punching(context.get('request')):
+        return punch_hole(template_name, kwargs)
+    fragment = context.template.engine.get_template(template_name)
+    with context.push(**kwargs):
+        return fragment.render(context)
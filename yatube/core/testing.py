@@ -0,0 +1,51 @@
+"""Помощники для тестов проекта."""
+from contextlib import ExitStack
+
+from django.db import connections
+from django.test.runner import DiscoverRunner
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import resolve
+
+from .query_budget import get_budget
+
+
+class TestRunner(DiscoverRunner):
+    """Тесты с фоновыми задачами, выполняемыми в текущем потоке.
+
+    Фоновый поток пережил бы временные каталоги и базу теста.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.eager_tasks = override_settings(BACKGROUND_TASKS_EAGER=True)
+        self.eager_tasks.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.eager_tasks.disable()
+        super().teardown_test_environment(**kwargs)
+
+
+class QueryBudgetTestMixin:
+    """Проверка бюджета запросов представления в TestCase.
+
+    Запросы считаются по всем базам, как в QueryBudgetMiddleware.
+    """
+
+    def assertWithinQueryBudget(self, client, url, **extra):
+        budget = get_budget(resolve(url.split('?')[0]).func)
+        self.assertIsNotNone(budget, f'{url}: бюджет запросов не объявлен')
+        with ExitStack() as stack:
+            captured = [
+                stack.enter_context(CaptureQueriesContext(connection))
+                for connection in connections.all()
+            ]
+            response = client.get(url, **extra)
+        queries = [query for context in captured for query in context]
+        self.assertLessEqual(
+            len(queries), budget,
+            '{}: {} запросов при бюджете {}:\n{}'.format(
+                url, len(queries), budget,
+                '\n'.join(query['sql'] for query in queries),
+            )
+        )
+        return response
@@ -0,0 +1,69 @@
+import shutil
+import tempfile
+import time
+
+from django.test import SimpleTestCase
+
+from core.cache_backends import SQLiteCache
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = f'{self.directory}/cache.sqlite3'
+        self.cache = self.make_cache()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def make_cache(self, **options):
+        options.setdefault('L1_TIMEOUT', 0)
+        return SQLiteCache(self.location, {'OPTIONS': options})
+
+    def test_set_get_delete(self):
+        self.cache.set('key', {'a': 1})
+        self.assertEqual(self.cache.get('key'), {'a': 1})
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_expired_entry_is_missing(self):
+        self.cache.set('key', 'value', 0.01)
+        time.sleep(0.02)
+        self.assertEqual(self.cache.get('key', 'default'), 'default')
+        self.assertTrue(self.cache.add('key', 'new'))
+
+    def test_add_and_incr_are_shared_between_processes(self):
+        """Два экземпляра бэкенда видят один файл, как разные воркеры."""
+        other = self.make_cache()
+        self.assertTrue(self.cache.add('lock', True))
+        self.assertFalse(other.add('lock', True))
+        self.cache.set('counter', 1)
+        self.assertEqual(other.incr('counter', 5), 6)
+        self.assertEqual(self.cache.get('counter'), 6)
+        with self.assertRaises(ValueError):
+            other.incr('missing')
+
+    def test_l1_serves_repeated_reads(self):
+        cache = self.make_cache(L1_TIMEOUT=60)
+        cache.set('key', 'first')
+        self.make_cache().set('key', 'second')
+        self.assertEqual(cache.get('key'), 'first')
+        cache.delete('key')
+        self.assertIsNone(cache.get('key'))
+
+    def test_get_many_set_many(self):
+        self.cache.set_many({'a': 1, 'b': 2})
+        self.assertEqual(
+            self.cache.get_many(['a', 'b', 'c']), {'a': 1, 'b': 2}
+        )
+
+    def test_lru_eviction(self):
+        cache = self.make_cache(
+            MAX_ENTRIES=2, CULL_FREQUENCY=0, CULL_EVERY=1
+        )
+        cache.set('old', 1)
+        cache.set('recent', 2)
+        cache.set('new', 3)
+        self.assertIsNone(cache.get('old'))
+        self.assertEqual(cache.get_many(['recent', 'new']),
+                         {'recent': 2, 'new': 3})
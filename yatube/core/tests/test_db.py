@@ -0,0 +1,42 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from core.db import configure_sqlite
+
+
+class SQLitePragmaTests(TestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied_to_new_connection(self):
+        previous = self.pragma('cache_size')
+        self.addCleanup(self._reset, previous)
+        with override_settings(SQLITE_PRAGMAS={'cache_size': -1234}):
+            configure_sqlite(None, connection)
+        self.assertEqual(self.pragma('cache_size'), -1234)
+
+    def test_no_pragmas_by_default(self):
+        previous = self.pragma('cache_size')
+        with override_settings(SQLITE_PRAGMAS={}):
+            configure_sqlite(None, connection)
+        self.assertEqual(self.pragma('cache_size'), previous)
+
+    def _reset(self, cache_size):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA cache_size = {cache_size}')
+
+
+class BenchmarkSQLiteTests(TestCase):
+    def test_benchmark_reports_both_profiles(self):
+        out = StringIO()
+        call_command(
+            'benchmark_sqlite', seconds=0.2, readers=2, writers=1, rows=100,
+            stdout=out,
+        )
+        self.assertIn('default', out.getvalue())
+        self.assertIn('production', out.getvalue())
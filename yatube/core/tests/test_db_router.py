@@ -0,0 +1,93 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.db import connections
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from core.db import copy_database
+from core.db_router import (PIN_COOKIE, PRIMARY, REPLICA, ReplicaMiddleware,
+                            ReplicaRouter, read_replica, reading_from)
+
+User = get_user_model()
+
+REPLICA_DATABASES = {
+    PRIMARY: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'},
+    REPLICA: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'},
+}
+
+
+@override_settings(DATABASES=REPLICA_DATABASES, REPLICA_LAG=10)
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+
+    def test_reads_follow_current_alias_and_writes_go_to_primary(self):
+        self.assertIsNone(self.router.db_for_read(User))
+        with reading_from(REPLICA):
+            self.assertEqual(self.router.db_for_read(User), REPLICA)
+            self.assertIsNone(self.router.db_for_read(Session))
+            self.assertEqual(self.router.db_for_write(User), PRIMARY)
+        self.assertFalse(self.router.allow_migrate(REPLICA, 'posts'))
+
+    def test_no_replica_alias_means_no_routing(self):
+        with override_settings(DATABASES={
+            PRIMARY: REPLICA_DATABASES[PRIMARY]
+        }), reading_from(REPLICA):
+            self.assertIsNone(self.router.db_for_read(User))
+
+    def run_view(self, request, view):
+        seen = []
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            return view(request, seen)
+
+        middleware = ReplicaMiddleware(get_response)
+        response = middleware(request)
+        return response, seen
+
+    def test_marked_views_read_from_replica_until_user_writes(self):
+        @read_replica
+        def view(request, seen):
+            seen.append(self.router.db_for_read(User))
+            return HttpResponse()
+
+        response, seen = self.run_view(self.factory.get('/'), view)
+        self.assertEqual(seen, [REPLICA])
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+        self.assertIsNone(self.router.db_for_read(User))
+
+        response, _ = self.run_view(self.factory.post('/'), view)
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], 10)
+
+        request = self.factory.get('/')
+        request.COOKIES[PIN_COOKIE] = '1'
+        _, seen = self.run_view(request, view)
+        self.assertEqual(seen, [None])
+
+
+class CopyDatabaseTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def test_copy_database_copies_rows(self):
+        source = connections[PRIMARY].__class__({
+            **connections[PRIMARY].settings_dict,
+            'NAME': os.path.join(self.directory, 'primary.sqlite3'),
+        }, alias='copy-source')
+        self.addCleanup(source.close)
+        with source.cursor() as cursor:
+            cursor.execute('CREATE TABLE t (x INTEGER)')
+            cursor.execute('INSERT INTO t VALUES (42)')
+        path = os.path.join(self.directory, 'replica.sqlite3')
+        copy_database(source, path)
+        copy = sqlite3.connect(path)
+        self.addCleanup(copy.close)
+        self.assertEqual(copy.execute('SELECT x FROM t').fetchall(), [(42,)])
@@ -0,0 +1,27 @@
+from io import BytesIO
+
+from django.test import SimpleTestCase
+from PIL import Image
+
+from core.images import describe
+
+
+def image_file(size, color, image_format):
+    file = BytesIO()
+    Image.new('RGB', size, color).save(file, image_format)
+    return file
+
+
+class DescribeTests(SimpleTestCase):
+    def test_size_color_and_preview(self):
+        file = image_file((300, 100), (200, 30, 40), 'PNG')
+        info = describe(file)
+        self.assertEqual((info.width, info.height), (300, 100))
+        self.assertEqual(info.color, '#c81e28')
+        self.assertTrue(info.lqip.startswith('data:image/jpeg;base64,'))
+        self.assertEqual(file.tell(), 0)
+
+    def test_large_jpeg_keeps_original_size(self):
+        info = describe(image_file((4000, 3000), (0, 0, 255), 'JPEG'))
+        self.assertEqual((info.width, info.height), (4000, 3000))
+        self.assertLess(len(info.lqip), 1000)
@@ -0,0 +1,33 @@
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from core.page_cache import _version_key, bump, get_versions
+
+
+class VersionTimeoutTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_versions_expire_after_pages(self):
+        self.assertGreater(
+            settings.PAGE_VERSION_TIMEOUT,
+            settings.PAGE_CACHE_TIMEOUT + settings.PAGE_CACHE_STALE_TIMEOUT,
+        )
+        with mock.patch.object(
+            cache, 'set_many', wraps=cache.set_many
+        ) as set_many:
+            get_versions(['group:missing'])
+            bump('group:missing')
+        self.assertEqual(
+            [call.args[1] for call in set_many.call_args_list],
+            [settings.PAGE_VERSION_TIMEOUT] * 2,
+        )
+
+    def test_expired_version_is_replaced_by_newer(self):
+        [version] = get_versions(['index'])
+        cache.delete(_version_key('index'))
+        [renewed] = get_versions(['index'])
+        self.assertGreater(renewed, version)
@@ -0,0 +1,37 @@
+from unittest import mock
+
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from core import query_budget
+from core.query_budget import (QueryBudgetExceeded, QueryBudgetMiddleware,
+                               query_budget as budget)
+
+
+class QueryBudgetMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        self.replica = DatabaseWrapper(
+            dict(connection.settings_dict, NAME=':memory:'), alias='replica'
+        )
+        self.addCleanup(self.replica.close)
+
+    @override_settings(QUERY_BUDGET_RAISE=True)
+    def test_queries_to_other_aliases_count(self):
+        @budget(1)
+        def view(request):
+            with self.replica.cursor() as cursor:
+                cursor.execute('SELECT 1')
+                cursor.execute('SELECT 2')
+            return HttpResponse()
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            return view(request)
+
+        middleware = QueryBudgetMiddleware(get_response)
+        handler = mock.Mock(all=lambda: [self.replica])
+        with mock.patch.object(query_budget, 'connections', handler):
+            with self.assertRaises(QueryBudgetExceeded):
+                middleware(RequestFactory().get('/'))
@@ -0,0 +1,46 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from core import tasks
+
+
+class TasksTests(SimpleTestCase):
+    @override_settings(BACKGROUND_TASKS_EAGER=False)
+    def test_duplicate_task_is_not_queued_twice(self):
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def work(value):
+            calls.append(value)
+            started.set()
+            release.wait(5)
+
+        executor = ThreadPoolExecutor(max_workers=2)
+        with mock.patch.object(tasks, '_executor', executor), \
+                mock.patch.object(tasks.transaction, 'on_commit',
+                                  lambda func: func()):
+            tasks.submit(work, 1)
+            self.assertTrue(started.wait(5))
+            tasks.submit(work, 1)
+            release.set()
+            executor.shutdown(wait=True)
+        self.assertEqual(calls, [1])
+        self.assertNotIn((work, (1,)), tasks._pending)
+
+    @override_settings(BACKGROUND_TASKS_EAGER=True)
+    def test_eager_task_runs_in_place_and_logs_errors(self):
+        calls = []
+
+        def fail(value):
+            calls.append(value)
+            raise ValueError(value)
+
+        with mock.patch.object(tasks.transaction, 'on_commit',
+                               lambda func: func()), \
+                self.assertLogs('core.tasks', 'ERROR'):
+            tasks.submit(fail, 2)
+        self.assertEqual(calls, [2])
@@ -0,0 +1,130 @@
+"""Приём загружаемых картинок с ограниченным расходом памяти.
+
+LimitedUploadHandler пишет каждый файл запроса кусками во временный файл
+на диске и перестаёт писать после UPLOAD_MAX_BYTES. Форма проверяет
+размеры картинки по заголовку до декодирования (check_image) и сохраняет
+вместо оригинала уменьшенную копию без метаданных (normalize_image).
+"""
+import math
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, ImageOps
+
+# Форматы, в которых картинка остаётся; остальные сохраняются в PNG.
+KEEP_FORMATS = ('JPEG', 'PNG', 'GIF')
+EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png', 'GIF': '.gif'}
+# Из сведений картинки переносится только нужное для её вида.
+KEEP_INFO = ('transparency', 'icc_profile')
+
+
+class LimitedUploadHandler(TemporaryFileUploadHandler):
+    """Загрузка на диск; куски сверх UPLOAD_MAX_BYTES отбрасываются.
+
+    Запрос дочитывается до конца, чтобы разобрать остальные поля, а у
+    обрезанного файла выставлен exceeds_limit.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.UPLOAD_MAX_BYTES:
+            return None
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        file.exceeds_limit = file_size > settings.UPLOAD_MAX_BYTES
+        return file
+
+
+def exceeds_limit(file):
+    return (
+        getattr(file, 'exceeds_limit', False)
+        or file.size > settings.UPLOAD_MAX_BYTES
+    )
+
+
+def size_error():
+    return ValidationError(
+        'Файл больше %(limit)s.',
+        code='file_too_large',
+        params={'limit': filesizeformat(settings.UPLOAD_MAX_BYTES)},
+    )
+
+
+def check_image(image):
+    """Отказывает картинке больше UPLOAD_IMAGE_MAX_PIXELS пикселей.
+
+    Размеры берутся из заголовка: Image.open пиксели не декодирует.
+    """
+    width, height = image.size
+    if width * height > settings.UPLOAD_IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            'Картинка больше %(limit)d мегапикселей.',
+            code='too_many_pixels',
+            params={'limit': settings.UPLOAD_IMAGE_MAX_PIXELS // 10 ** 6},
+        )
+
+
+def _encode(image, image_format, out):
+    options = {
+        key: image.info[key] for key in KEEP_INFO if key in image.info
+    }
+    if image_format == 'JPEG':
+        if image.mode not in ('RGB', 'L', 'CMYK'):
+            image = image.convert('RGB')
+        options['quality'] = settings.UPLOAD_IMAGE_QUALITY
+    elif image.mode not in ('1', 'L', 'LA', 'P', 'RGB', 'RGBA'):
+        image = image.convert('RGBA')
+    # Сведения картинки (EXIF, XMP, комментарии) не переносим: кодеры
+    # берут часть из них прямо из image.info.
+    image.info = {}
+    image.save(out, image_format, **options)
+
+
+def normalize_image(file):
+    """Копия загруженной картинки во временном файле на диске.
+
+    Картинка поворачивается по EXIF, уменьшается до UPLOAD_IMAGE_MAX_SIDE
+    по большей стороне и перекодируется без метаданных. JPEG декодируется
+    в режиме draft сразу в уменьшенном масштабе, так что полный кадр в
+    память не распаковывается. У анимаций остаётся первый кадр.
+    """
+    max_side = settings.UPLOAD_IMAGE_MAX_SIDE
+    file.seek(0)
+    with Image.open(file) as image:
+        check_image(image)
+        source_format = image.format
+        # draft уменьшает JPEG, только если обе стороны хотя бы вдвое
+        # больше запрошенных, поэтому просим итоговый размер с пропорциями.
+        scale = min(1, max_side / max(image.size))
+        width, height = image.size
+        image.draft(
+            None, (math.ceil(width * scale), math.ceil(height * scale))
+        )
+        image = ImageOps.exif_transpose(image)
+    image.thumbnail((max_side, max_side))
+    image_format = (
+        source_format if source_format in KEEP_FORMATS else 'PNG'
+    )
+    root, extension = os.path.splitext(file.name)
+    if image_format != source_format:
+        extension = EXTENSIONS[image_format]
+    # Безымянный временный файл хранилище копирует, а не переносит, и он
+    # исчезает с диска при закрытии.
+    out = tempfile.TemporaryFile(dir=settings.FILE_UPLOAD_TEMP_DIR)
+    _encode(image, image_format, out)
+    size = out.tell()
+    out.seek(0)
+    return UploadedFile(
+        out, root + extension, Image.MIME[image_format], size
+    )
@@ -0,0 +1,109 @@
+"""Области кэша страниц постов и их инвалидация."""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+from core.page_cache import bump
+
+from .models import Group, Post
+
+User = get_user_model()
+
+INDEX = 'index'
+
+# Меняется вместе с разметкой posts/includes/post_card.html, чтобы после
+# выкладки не отдавать карточки, собранные по старому шаблону.
+CARD_VERSION = 3
+
+
+def group_scope(slug):
+    return f'group:{slug}'
+
+
+def profile_scope(username):
+    return f'profile:{username}'
+
+
+def post_scope(post_id):
+    return f'post:{post_id}'
+
+
+def index_scopes(request):
+    return [INDEX]
+
+
+def group_scopes(request, slug):
+    return [group_scope(slug)]
+
+
+def profile_scopes(request, username):
+    return [profile_scope(username)]
+
+
+def post_author(post_id):
+    """Имя автора поста; автор у поста не меняется, имя берётся из кэша."""
+    key = f'post-author:{post_id}'
+    username = cache.get(key)
+    if username is None:
+        username = Post.objects.filter(pk=post_id).values_list(
+            'author__username', flat=True
+        ).first()
+        if username is not None:
+            cache.set(key, username, settings.POST_CARD_CACHE_TIMEOUT)
+    return username
+
+
+def post_scopes(request, post_id):
+    # Страница поста показывает число постов автора, которое меняется
+    # вместе с его профилем.
+    username = post_author(post_id)
+    if username is None:
+        return [post_scope(post_id)]
+    return [post_scope(post_id), profile_scope(username)]
+
+
+def comments_scopes(request, post_id):
+    return [post_scope(post_id)]
+
+
+def card_key(post_id, show_author=True):
+    return f'post-card:v{CARD_VERSION}:{int(show_author)}:{post_id}'
+
+
+def cached_cards(post_ids, show_author=True):
+    """Посты из post_ids, чьи карточки уже лежат в кэше."""
+    keys = {card_key(post_id, show_author): post_id for post_id in post_ids}
+    return {keys[key] for key in cache.get_many(list(keys))}
+
+
+def invalidate_cards(post_ids):
+    cache.delete_many([
+        card_key(post_id, show_author)
+        for post_id in post_ids
+        for show_author in (True, False)
+    ])
+
+
+def invalidate_posts(author_ids=(), group_ids=(), post_ids=()):
+    """Сбрасывает главную, профили авторов, группы и страницы постов."""
+    usernames = User.objects.filter(
+        pk__in=set(author_ids)
+    ).values_list('username', flat=True)
+    slugs = Group.objects.filter(
+        pk__in={pk for pk in group_ids if pk}
+    ).values_list('slug', flat=True)
+    bump(
+        INDEX,
+        *(profile_scope(username) for username in usernames),
+        *(group_scope(slug) for slug in slugs),
+        *(post_scope(post_id) for post_id in post_ids),
+    )
+
+
+def invalidate_profiles(*author_ids):
+    bump(*(
+        profile_scope(username)
+        for username in User.objects.filter(
+            pk__in=author_ids
+        ).values_list('username', flat=True)
+    ))
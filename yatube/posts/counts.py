@@ -0,0 +1,115 @@
+"""Счётчики постов, комментариев и подписок.
+
+Число всех постов живёт в кэше: оно считается один раз при промахе, дальше
+его поддерживают сигналы через атомарные incr/decr. Счётчики по группе,
+посту и пользователю денормализованы в базу (Group.posts_count,
+Post.comments_count, UserCounters) и меняются одним UPDATE ... SET x = x + 1
+в той же транзакции, что и сам объект. rebuild_all() пересчитывает их
+массово, если они разошлись с данными.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from core.paginators import estimate_count
+
+from .models import Comment, Follow, Group, Post, UserCounters
+
+User = get_user_model()
+
+ALL_POSTS_KEY = 'posts:count'
+
+
+def adjust(keys, delta):
+    """Сдвигает счётчики, которые уже лежат в кэше."""
+    for key in keys:
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            # Счётчика нет в кэше: его посчитают при первом чтении.
+            pass
+
+
+def total_count(queryset):
+    """Число всех постов; для очень больших таблиц — оценка по PK."""
+    count = cache.get(ALL_POSTS_KEY)
+    if count is None:
+        count = estimate_count(queryset.model)
+        if count < settings.POSTS_COUNT_ESTIMATE_THRESHOLD:
+            count = queryset.count()
+        cache.set(ALL_POSTS_KEY, count, settings.POSTS_COUNT_TIMEOUT)
+    return count
+
+
+def _shift(queryset, **deltas):
+    """UPDATE со сдвигом полей; ниже нуля счётчик не опускается."""
+    return queryset.update(**{
+        field: Greatest(F(field) + delta, 0)
+        for field, delta in deltas.items() if delta
+    })
+
+
+def change_group(group_id, delta):
+    if group_id:
+        _shift(Group.objects.filter(pk=group_id), posts_count=delta)
+
+
+def change_comments(post_id, delta):
+    _shift(Post.objects.filter(pk=post_id), comments_count=delta)
+
+
+def change_user(user_id, **deltas):
+    # Строку счётчиков создают сигнал регистрации и repair_counters.
+    # Создавать её здесь нельзя: пользователь может как раз удаляться.
+    _shift(UserCounters.objects.filter(user_id=user_id), **deltas)
+
+
+def user_counters(user):
+    """Счётчики пользователя; без строки в базе — посчитанные на лету.
+
+    Вызывается из представлений, читающих с реплики, поэтому недостающую
+    строку не создаёт: её восстановит repair_counters.
+    """
+    try:
+        return user.counters
+    except ObjectDoesNotExist:
+        pass
+    values = User.objects.filter(pk=user.pk).values(
+        posts_count=_count_of(Post.objects.all(), 'author'),
+        followers_count=_count_of(Follow.objects.all(), 'author'),
+        following_count=_count_of(Follow.objects.all(), 'user'),
+    ).get()
+    return UserCounters(user=user, **values)
+
+
+def _count_of(queryset, field):
+    """Подзапрос «число строк queryset с field = pk внешней строки»."""
+    counted = queryset.filter(
+        **{field: OuterRef('pk')}
+    ).order_by().values(field).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counted), Value(0))
+
+
+@transaction.atomic
+def rebuild_all():
+    """Пересчитывает все денормализованные счётчики несколькими UPDATE."""
+    UserCounters.objects.bulk_create(
+        [UserCounters(user_id=pk) for pk in User.objects.filter(
+            counters__isnull=True
+        ).values_list('pk', flat=True).iterator()],
+        ignore_conflicts=True,
+    )
+    UserCounters.objects.update(
+        posts_count=_count_of(Post.objects.all(), 'author'),
+        followers_count=_count_of(Follow.objects.all(), 'author'),
+        following_count=_count_of(Follow.objects.all(), 'user'),
+    )
+    Group.objects.update(posts_count=_count_of(Post.objects.all(), 'group'))
+    Post.objects.update(
+        comments_count=_count_of(Comment.objects.all(), 'post')
+    )
+    cache.delete(ALL_POSTS_KEY)
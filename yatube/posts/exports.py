@@ -0,0 +1,109 @@
+"""Выгрузка постов и комментариев пользователя.
+
+Записи имеют формат команды import_posts, так что выгрузку можно
+загрузить обратно. База читается через .iterator(chunk_size=...), файлы
+картинок — кусками хранилища, а ответ собирается генераторами, поэтому
+память не зависит от размера аккаунта.
+"""
+import csv
+import itertools
+import json
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+from core.streaming import Echo, buffered, stream_zip
+
+from .models import Comment, Post
+
+FIELDS = (
+    'type', 'id', 'post', 'author', 'group', 'text', 'pub_date', 'created',
+    'image',
+)
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+    'zip': 'application/zip',
+}
+
+
+def records(user):
+    """Посты пользователя, затем его комментарии."""
+    chunk_size = settings.EXPORT_CHUNK_SIZE
+    posts = Post.objects.filter(author=user).select_related('group').only(
+        'id', 'text', 'pub_date', 'image', 'group__slug'
+    ).order_by('pub_date', 'id')
+    for post in posts.iterator(chunk_size=chunk_size):
+        yield {
+            'type': 'post',
+            'id': post.pk,
+            'author': user.username,
+            'group': post.group.slug if post.group else None,
+            'text': post.text,
+            'pub_date': post.pub_date.isoformat(),
+            'image': post.image.name or None,
+        }
+    comments = Comment.objects.filter(author=user).only(
+        'post_id', 'text', 'created'
+    ).order_by('created', 'id')
+    for comment in comments.iterator(chunk_size=chunk_size):
+        yield {
+            'type': 'comment',
+            'post': comment.post_id,
+            'author': user.username,
+            'text': comment.text,
+            'created': comment.created.isoformat(),
+        }
+
+
+def as_ndjson(records):
+    for record in records:
+        yield json.dumps(
+            {key: value for key, value in record.items() if value is not None},
+            ensure_ascii=False,
+        ) + '\n'
+
+
+def as_csv(records):
+    writer = csv.DictWriter(Echo(), FIELDS, restval='')
+    yield writer.writeheader()
+    for record in records:
+        yield writer.writerow(record)
+
+
+FORMATTERS = {'ndjson': as_ndjson, 'csv': as_csv}
+
+
+def _file_chunks(file):
+    with file:
+        yield from file.chunks()
+
+
+def image_files(user):
+    """Пары (имя в архиве, куски файла) для картинок постов."""
+    names = Post.objects.filter(author=user).exclude(image='').values_list(
+        'image', flat=True
+    ).order_by('id')
+    for name in names.iterator(chunk_size=settings.EXPORT_CHUNK_SIZE):
+        try:
+            file = default_storage.open(name)
+        except OSError:
+            # Файл пропал из хранилища — выгружаем остальное.
+            continue
+        yield name, _file_chunks(file)
+
+
+def export_chunks(user, data_format, images=False):
+    """Куски выгрузки: текст в data_format или zip с ним и картинками."""
+    lines = FORMATTERS[data_format](records(user))
+    if not images:
+        return buffered(lines)
+    data = (line.encode() for line in lines)
+    return stream_zip(itertools.chain(
+        [(f'{user.username}.{data_format}', buffered(data))],
+        image_files(user),
+    ))
+
+
+def export_filename(user, data_format, images=False):
+    return f'{user.username}.{"zip" if images else data_format}'
@@ -1,6 +1,12 @@
 from django import forms
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import UploadedFile
 
-from .models import Post, Comment
+from core import uploads
+
+from .models import Group, Post, Comment
+
+User = get_user_model()
 
 
 class PostForm(forms.ModelForm):
@@ -13,6 +19,24 @@ class PostForm(forms.ModelForm):
             'group': 'Группа, к которой будет относиться пост',
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Слишком большой файл Pillow не открываем вовсе: поле его не
+        # увидит, а clean_image сообщит о размере.
+        image = self.files.get('image')
+        self.image_too_large = bool(image) and uploads.exceeds_limit(image)
+        if self.image_too_large:
+            self.files = self.files.copy()
+            del self.files['image']
+
+    def clean_image(self):
+        if self.image_too_large:
+            raise uploads.size_error()
+        image = self.cleaned_data['image']
+        if isinstance(image, UploadedFile):
+            return uploads.normalize_image(image)
+        return image
+
 
 class CommentForm(forms.ModelForm):
 
@@ -22,3 +46,23 @@ class CommentForm(forms.ModelForm):
         help_text = {
             'text': 'Текст комментария',
         }
+
+
+class SearchForm(forms.Form):
+    q = forms.CharField(label='Найти', max_length=200)
+    group = forms.ModelChoiceField(
+        Group.objects.all(),
+        label='Группа',
+        to_field_name='slug',
+        required=False,
+    )
+    author = forms.CharField(label='Автор', max_length=150, required=False)
+
+    def clean_author(self):
+        username = self.cleaned_data['author']
+        if not username:
+            return None
+        try:
+            return User.objects.get(username=username)
+        except User.DoesNotExist:
+            raise forms.ValidationError('Такого автора нет.')
@@ -0,0 +1,26 @@
+"""Сведения о картинке поста, хранящиеся в самом посте.
+
+Размеры, основной цвет и LQIP считаются один раз при загрузке картинки,
+и шаблоны выводят по ним рамку и фон без обращения к файлу.
+"""
+from core.images import describe
+
+FIELDS = ('image_width', 'image_height', 'image_color', 'image_lqip')
+EMPTY = (None, None, '', '')
+
+
+def fill(post, file):
+    """Записывает в пост сведения о картинке из file.
+
+    Без файла или для файла, который Pillow не читает, поля очищаются.
+    """
+    values = EMPTY
+    if file:
+        try:
+            info = describe(file)
+        except OSError:
+            pass
+        else:
+            values = (info.width, info.height, info.color, info.lqip)
+    for field, value in zip(FIELDS, values):
+        setattr(post, field, value)
@@ -0,0 +1,58 @@
+"""Размеры, цвет и LQIP для картинок, загруженных до их появления в Post.
+
+Новые загрузки описываются при сохранении поста; команда доделывает
+старые посты и после сбоя продолжает с того места, где остановилась.
+"""
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from posts import cache, images
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Сохраняет в постах размеры, цвет и превью их картинок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=200,
+            help='Сколько постов обрабатывать между сбросами кэша.',
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').filter(
+            image_width__isnull=True
+        ).only('pk', 'author_id', 'group_id', 'image').order_by('pk')
+        described = skipped = 0
+        last_pk = 0
+        while True:
+            batch = list(posts.filter(pk__gt=last_pk)[:options['batch_size']])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            for post in batch:
+                try:
+                    file = default_storage.open(post.image.name)
+                except OSError:
+                    # Файл пропал из хранилища; пост останется без сведений.
+                    skipped += 1
+                    continue
+                with file:
+                    images.fill(post, file)
+                if post.image_width is None:
+                    skipped += 1
+                    continue
+                Post.objects.filter(pk=post.pk).update(**{
+                    field: getattr(post, field) for field in images.FIELDS
+                })
+                described += 1
+            pks = [post.pk for post in batch]
+            cache.invalidate_posts(
+                {post.author_id for post in batch},
+                {post.group_id for post in batch},
+                pks,
+            )
+            cache.invalidate_cards(pks)
+        self.stdout.write(self.style.SUCCESS(
+            f'Описано картинок: {described}, пропущено: {skipped}.'
+        ))
@@ -0,0 +1,144 @@
+"""Проверка планов запросов страниц ленты через EXPLAIN QUERY PLAN.
+
+Команда вызывает представления с отключённым кэшем, собирает все
+SELECT-запросы и падает, если хоть один читает таблицу целиком
+(SCAN без индекса) или сортирует во временном B-дереве.
+"""
+import re
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.http import Http404
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+
+from core.paginators import NEXT, encode_cursor
+from posts import timeline
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+DUMMY_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    },
+}
+
+# Проход по материализованному подзапросу не считается: план самого
+# подзапроса проверяется отдельными строками.
+FULL_SCAN_RE = re.compile(r'^SCAN (TABLE )?(?!\(?subquery)\S+( AS \S+)?$')
+
+
+def plan_problems(plan):
+    """Строки плана с полным проходом по таблице или временной сортировкой."""
+    return [
+        detail for detail in plan
+        if FULL_SCAN_RE.match(detail) or 'USE TEMP B-TREE' in detail
+    ]
+
+
+def explain(sql):
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+class Command(BaseCommand):
+    help = ('Проверяет EXPLAIN QUERY PLAN запросов страниц ленты: '
+            'без полных проходов по таблицам и временных сортировок.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            help='Пользователь, от имени которого открывать страницы '
+                 '(по умолчанию — первый подписчик).',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Команда разбирает планы только SQLite.')
+        self.verbosity = options['verbosity']
+        user = self.get_user(options['user'])
+        problems = []
+        with override_settings(CACHES=DUMMY_CACHES):
+            for url in self.get_urls(user):
+                for visitor in (AnonymousUser(), user):
+                    if visitor is None:
+                        continue
+                    problems += self.check_url(url, visitor)
+        if problems:
+            raise CommandError(
+                'Запросы без подходящего индекса:\n' + '\n'.join(problems)
+            )
+        self.stdout.write(self.style.SUCCESS('Все планы используют индексы.'))
+
+    def get_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'Пользователь {username} не найден.')
+        follow = Follow.objects.select_related('user').first()
+        if follow is not None:
+            return follow.user
+        return User.objects.first()
+
+    def get_urls(self, user):
+        urls = [reverse('posts:index')]
+        post = Post.objects.first()
+        if post is not None:
+            cursor = encode_cursor(NEXT, [post.pub_date, post.pk])
+            urls += [
+                reverse('posts:index') + '?page=2',
+                reverse('posts:index') + '?cursor=' + cursor,
+                reverse('posts:profile', args=[post.author.username]),
+                reverse('posts:profile', args=[post.author.username])
+                + '?cursor=' + cursor,
+                reverse('posts:post_detail', args=[post.pk]),
+            ]
+        comment = Comment.objects.first()
+        if comment is not None:
+            cursor = encode_cursor(NEXT, [comment.created, comment.pk])
+            urls.append(
+                reverse('posts:post_comments', args=[comment.post_id])
+                + '?cursor=' + cursor
+            )
+        group = Group.objects.filter(posts__isnull=False).first()
+        if group is not None:
+            urls.append(reverse('posts:group_list', args=[group.slug]))
+        if user is not None:
+            urls.append(reverse('posts:follow_index'))
+            entry = timeline.get_feed(user).first()
+            if entry is not None:
+                cursor = encode_cursor(
+                    NEXT, [entry.feed_date, entry.feed_post]
+                )
+                urls.append(reverse('posts:follow_index') + '?cursor='
+                            + cursor)
+        return urls
+
+    def check_url(self, url, user):
+        request = RequestFactory().get(url)
+        request.user = user
+        match = resolve(request.path)
+        with CaptureQueriesContext(connection) as queries:
+            try:
+                match.func(request, *match.args, **match.kwargs)
+            except Http404:
+                pass
+        problems = []
+        for query in queries:
+            sql = query['sql']
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            plan = explain(sql)
+            bad = plan_problems(plan)
+            if self.verbosity >= 2 or bad:
+                self.stdout.write(f'{url} ({user}): {sql}')
+                for detail in plan:
+                    self.stdout.write(f'    {detail}')
+            problems += [f'{url} ({user}): {detail}' for detail in bad]
+        return problems
@@ -0,0 +1,48 @@
+"""Выгрузка постов и комментариев пользователя в файл или stdout."""
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import exports
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Выгружает посты и комментарии пользователя в NDJSON или CSV, '
+            'по желанию — zip-архивом вместе с картинками.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument(
+            '--format', choices=sorted(exports.FORMATTERS), default='ndjson'
+        )
+        parser.add_argument(
+            '--images', action='store_true',
+            help='Собрать zip-архив с выгрузкой и картинками постов.',
+        )
+        parser.add_argument(
+            '--output', default='-',
+            help='Файл для выгрузки; «-» — стандартный вывод.',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(
+                f'Пользователь {options["username"]} не найден.'
+            )
+        chunks = exports.export_chunks(
+            user, options['format'], options['images']
+        )
+        if options['output'] == '-':
+            self.write_chunks(sys.stdout.buffer, chunks)
+        else:
+            with open(options['output'], 'wb') as output:
+                self.write_chunks(output, chunks)
+
+    def write_chunks(self, output, chunks):
+        for chunk in chunks:
+            output.write(chunk.encode() if isinstance(chunk, str) else chunk)
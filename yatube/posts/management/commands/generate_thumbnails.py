@@ -0,0 +1,23 @@
+"""Миниатюры всех пресетов для уже загруженных картинок.
+
+Нужна после добавления или изменения пресета в THUMBNAIL_PRESETS: готовые
+миниатюры sorl находит в хранилище ключей и не пересобирает.
+"""
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Создаёт миниатюры всех пресетов для картинок постов.'
+
+    def handle(self, *args, **options):
+        names = Post.objects.exclude(image='').order_by().values_list(
+            'image', flat=True
+        ).distinct()
+        done = 0
+        for name in names.iterator():
+            thumbnails.generate(name)
+            done += 1
+        self.stdout.write(self.style.SUCCESS(f'Обработано картинок: {done}.'))
@@ -0,0 +1,13 @@
+"""Массовый пересчёт денормализованных счётчиков."""
+from django.core.management.base import BaseCommand
+
+from posts import counts
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счётчики постов, комментариев и подписок '
+            'по данным в базе.')
+
+    def handle(self, *args, **options):
+        counts.rebuild_all()
+        self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны.'))
@@ -0,0 +1,50 @@
+"""Фоновая пересборка HTML постов и комментариев после смены рендерера."""
+from django.core.management.base import BaseCommand
+
+from core.page_cache import bump
+from posts import cache, rendering
+from posts.models import Comment, Post
+
+
+class Command(BaseCommand):
+    help = ('Пересобирает сохранённый HTML постов и комментариев, '
+            'отрендеренный старой версией рендерера.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Сколько строк пересобирать в одной транзакции.',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        posts = self.rerender(Post, batch_size, self.invalidate_posts)
+        comments = self.rerender(
+            Comment, batch_size, self.invalidate_comments
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересобрано постов: {posts}, комментариев: {comments}.'
+        ))
+
+    def rerender(self, model, batch_size, invalidate):
+        total = 0
+        last_pk = 0
+        while True:
+            batch = rendering.rerender(model, batch_size, last_pk)
+            if not batch:
+                return total
+            invalidate(batch)
+            total += len(batch)
+            last_pk = batch[-1].pk
+
+    def invalidate_posts(self, posts):
+        pks = [post.pk for post in posts]
+        cache.invalidate_posts(
+            {post.author_id for post in posts},
+            {post.group_id for post in posts},
+            pks,
+        )
+        cache.invalidate_cards(pks)
+
+    def invalidate_comments(self, comments):
+        bump(*{cache.post_scope(comment.post_id) for comment in comments})
@@ -0,0 +1,43 @@
+# Generated by Django 2.2.16 on 2026-10-17 07:25
+
+from django.db import migrations, models
+from django.utils.html import linebreaks
+from django.utils.text import Truncator
+
+# Правила на момент миграции; код приложения может измениться позже.
+EXCERPT_LENGTH = 500
+BATCH_SIZE = 500
+
+
+def fill_excerpts(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    batch = []
+    for post in Post.objects.only('pk', 'text').iterator():
+        post.excerpt = Truncator(post.text).chars(EXCERPT_LENGTH)
+        post.excerpt_html = linebreaks(post.excerpt, autoescape=True)
+        batch.append(post)
+        if len(batch) == BATCH_SIZE:
+            Post.objects.bulk_update(batch, ['excerpt', 'excerpt_html'])
+            batch = []
+    Post.objects.bulk_update(batch, ['excerpt', 'excerpt_html'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Начало текста'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='excerpt_html',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Начало текста в HTML'),
+        ),
+        migrations.RunPython(fill_excerpts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 2.2.16 on 2026-10-17 07:26
+
+from django.db import migrations, models
+from django.utils.html import linebreaks
+
+# Рендерер на момент миграции; код приложения может измениться позже.
+RENDERER_VERSION = 1
+BATCH_SIZE = 500
+
+
+def render_html(apps, schema_editor):
+    for name in ('Post', 'Comment'):
+        model = apps.get_model('posts', name)
+        batch = []
+        for obj in model.objects.only('pk', 'text').iterator():
+            obj.text_html = linebreaks(obj.text, autoescape=True)
+            obj.html_version = RENDERER_VERSION
+            batch.append(obj)
+            if len(batch) == BATCH_SIZE:
+                model.objects.bulk_update(
+                    batch, ['text_html', 'html_version']
+                )
+                batch = []
+        model.objects.bulk_update(batch, ['text_html', 'html_version'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_post_excerpt'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='html_version',
+            field=models.PositiveSmallIntegerField(blank=True, default=0, editable=False, verbose_name='Версия рендерера'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='text_html',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Текст в HTML'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='html_version',
+            field=models.PositiveSmallIntegerField(blank=True, default=0, editable=False, verbose_name='Версия рендерера'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='text_html',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Текст в HTML'),
+        ),
+        migrations.RunPython(render_html, migrations.RunPython.noop),
+    ]
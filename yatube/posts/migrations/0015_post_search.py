@@ -0,0 +1,52 @@
+# Generated by Django 2.2.16 on 2026-10-17 07:38
+
+import core.fields
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Индекс FTS5 и его триггеры такими, какими они были на момент миграции;
+# posts.search может измениться позже.
+CREATE_SQL = [
+    "CREATE VIRTUAL TABLE posts_post_fts USING fts5("
+    "text, content='posts_post', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER posts_post_fts_insert AFTER INSERT ON posts_post BEGIN "
+    "INSERT INTO posts_post_fts(rowid, text) VALUES (new.id, new.text); END",
+    "CREATE TRIGGER posts_post_fts_delete AFTER DELETE ON posts_post BEGIN "
+    "INSERT INTO posts_post_fts(posts_post_fts, rowid, text) "
+    "VALUES ('delete', old.id, old.text); END",
+    "CREATE TRIGGER posts_post_fts_update AFTER UPDATE OF text ON posts_post "
+    "BEGIN INSERT INTO posts_post_fts(posts_post_fts, rowid, text) "
+    "VALUES ('delete', old.id, old.text); "
+    "INSERT INTO posts_post_fts(rowid, text) VALUES (new.id, new.text); END",
+    "INSERT INTO posts_post_fts(posts_post_fts) VALUES ('rebuild')",
+]
+DROP_SQL = [
+    'DROP TRIGGER IF EXISTS posts_post_fts_insert',
+    'DROP TRIGGER IF EXISTS posts_post_fts_delete',
+    'DROP TRIGGER IF EXISTS posts_post_fts_update',
+    'DROP TABLE posts_post_fts',
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_rendered_html'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostSearch',
+            fields=[
+                ('post', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search', serialize=False, to='posts.Post')),
+                ('text', core.fields.FullTextField()),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'posts_post_fts',
+                'managed': False,
+            },
+        ),
+        migrations.RunSQL(CREATE_SQL, DROP_SQL),
+    ]
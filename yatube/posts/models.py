@@ -1,20 +1,50 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db import models
-from core.models import CreatedModel
+from django.utils.text import Truncator
+
+from core.fields import DerivedIntegerField, DerivedTextField, FullTextField
+from core.models import CountersModel, CreatedModel
+
+from .rendering import render_text, renderer_version
 
 User = get_user_model()
 
 
-class Group(models.Model):
+def make_excerpt(text):
+    """Начало текста поста для карточек в лентах."""
+    length = settings.POST_EXCERPT_LENGTH
+    if len(text) <= length:
+        # Короткий текст берётся целиком: Truncator прошёл бы его
+        # посимвольно, а при массовой загрузке это основная работа.
+        return text
+    return Truncator(text).chars(length)
+
+
+def render_excerpt(excerpt, text, text_html):
+    """HTML начала текста; у короткого поста это готовый text_html."""
+    if excerpt == text:
+        return text_html
+    return render_text(excerpt)
+
+
+class Group(CountersModel):
+    counter_fields = ('posts_count',)
+
     title = models.CharField(max_length=200)
     slug = models.SlugField(max_length=30, unique=True)
     description = models.TextField()
+    posts_count = models.PositiveIntegerField(
+        'Число постов', default=0, editable=False
+    )
 
     def __str__(self):
         return self.title
 
 
-class Post(models.Model):
+class Post(CountersModel):
+    counter_fields = ('comments_count',)
+
     text = models.TextField(
         help_text='Введите текст поста',
         verbose_name='текст поста'
@@ -39,14 +69,77 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    image_width = models.PositiveIntegerField(
+        'Ширина картинки', null=True, blank=True, editable=False
+    )
+    image_height = models.PositiveIntegerField(
+        'Высота картинки', null=True, blank=True, editable=False
+    )
+    image_color = models.CharField(
+        'Основной цвет картинки', max_length=7, blank=True, editable=False
+    )
+    image_lqip = models.TextField(
+        'Превью картинки', blank=True, editable=False
+    )
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев', default=0, editable=False
+    )
+    excerpt = DerivedTextField(
+        'Начало текста', source='text', derive=make_excerpt
+    )
+    text_html = DerivedTextField(
+        'Текст в HTML', source='text', derive=render_text
+    )
+    excerpt_html = DerivedTextField(
+        'Начало текста в HTML',
+        source=('excerpt', 'text', 'text_html'),
+        derive=render_excerpt,
+    )
+    html_version = DerivedIntegerField(
+        'Версия рендерера', source='text', derive=renderer_version
+    )
 
     class Meta:
         ordering = ("-pub_date", )
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'], name='post_date_idx',
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_date_idx',
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_date_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
 
+class PostSearch(models.Model):
+    """Строка полнотекстового индекса постов (виртуальная таблица FTS5).
+
+    Таблицу и триггеры, которые держат её в актуальном состоянии, создаёт
+    posts.search; rank — релевантность bm25, меньше — лучше.
+    """
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column='rowid',
+        related_name='search',
+    )
+    text = FullTextField()
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'posts_post_fts'
+
+
 class Comment(CreatedModel):
     text = models.TextField(
         help_text='Введите текст комментария',
@@ -64,11 +157,23 @@ class Comment(CreatedModel):
         help_text='Пост к которому будет относиться комментарий',
         verbose_name='Комментарий'
     )
+    text_html = DerivedTextField(
+        'Текст в HTML', source='text', derive=render_text
+    )
+    html_version = DerivedIntegerField(
+        'Версия рендерера', source='text', derive=renderer_version
+    )
 
     class Meta:
         ordering = ("-created", )
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(
+                fields=['post', '-created', '-id'],
+                name='comment_post_created_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.text
@@ -97,3 +202,75 @@ class Follow(CreatedModel):
 
     def __str__(self):
         return self.text
+
+
+class UserCounters(models.Model):
+    """Денормализованные счётчики пользователя."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counters',
+    )
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+    followers_count = models.PositiveIntegerField(
+        'Число подписчиков', default=0
+    )
+    following_count = models.PositiveIntegerField(
+        'Число подписок', default=0
+    )
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+    def __str__(self):
+        return str(self.user_id)
+
+
+class TimelineEntry(models.Model):
+    """Запись материализованной ленты подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        ordering = ('-pub_date', )
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_date_idx',
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_timeline_entry'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user} — {self.post}'
+
+
+class ImportCheckpoint(models.Model):
+    """Сколько записей источника уже загрузила команда import_posts."""
+    source = models.CharField('Источник', max_length=255, unique=True)
+    position = models.BigIntegerField('Загружено записей', default=0)
+    updated = models.DateTimeField('Обновлено', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Точка загрузки'
+        verbose_name_plural = 'Точки загрузки'
+
+    def __str__(self):
+        return f'{self.source}: {self.position}'
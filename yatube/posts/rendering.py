@@ -0,0 +1,43 @@
+"""Рендеринг текстов постов и комментариев в HTML при записи.
+
+HTML хранится рядом с текстом вместе с версией рендерера. Если разметка
+меняется, RENDERER_VERSION увеличивается: старые строки находит
+stale() и в фоне пересобирает команда rerender_html.
+"""
+from django.db import transaction
+from django.utils.html import linebreaks
+
+from core.fields import derived_fields
+
+RENDERER_VERSION = 1
+
+
+def render_text(text):
+    """Безопасный HTML: всё экранируется, переносы строк — абзацы."""
+    return linebreaks(text, autoescape=True)
+
+
+def renderer_version(text):
+    return RENDERER_VERSION
+
+
+def stale(model):
+    return model.objects.filter(html_version__lt=RENDERER_VERSION)
+
+
+def rerender(model, batch_size, after=0):
+    """Пересобирает HTML пачки устаревших строк с pk > after.
+
+    Возвращает пачку; следующий вызов продолжает с её последнего pk, так
+    что уже обработанные строки повторно не просматриваются.
+    """
+    fields = derived_fields(model)
+    with transaction.atomic():
+        batch = list(
+            stale(model).filter(pk__gt=after).order_by('pk')[:batch_size]
+        )
+        for obj in batch:
+            for field in fields:
+                field.pre_save(obj, add=False)
+        model.objects.bulk_update(batch, [field.name for field in fields])
+    return batch
@@ -0,0 +1,109 @@
+"""Полнотекстовый поиск по постам на SQLite FTS5.
+
+Индекс — виртуальная таблица posts_post_fts с внешним содержимым: сам
+текст хранится только в posts_post, индекс ссылается на посты по rowid.
+Актуальность поддерживают SQL-триггеры, поэтому индекс видит и
+bulk_create, и QuerySet.update(), и правки из консоли sqlite3.
+
+При пересборке таблицы posts_post (так SQLite-бэкенд Django выполняет
+AddField и AlterField) триггеры пропадают вместе со старой таблицей;
+ensure_index() после каждого migrate возвращает их и перестраивает индекс.
+"""
+import re
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import F
+
+from .models import Post
+
+TABLE = 'posts_post_fts'
+
+CREATE_TABLE_SQL = (
+    f"CREATE VIRTUAL TABLE {TABLE} USING fts5("
+    "text, content='posts_post', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')"
+)
+DROP_TABLE_SQL = f'DROP TABLE {TABLE}'
+REBUILD_SQL = f"INSERT INTO {TABLE}({TABLE}) VALUES ('rebuild')"
+
+_DELETE_ROW = (
+    f"INSERT INTO {TABLE}({TABLE}, rowid, text) "
+    "VALUES ('delete', old.id, old.text);"
+)
+_INSERT_ROW = f'INSERT INTO {TABLE}(rowid, text) VALUES (new.id, new.text);'
+
+TRIGGERS = {
+    f'{TABLE}_insert': (
+        f'AFTER INSERT ON posts_post BEGIN {_INSERT_ROW} END'
+    ),
+    f'{TABLE}_delete': (
+        f'AFTER DELETE ON posts_post BEGIN {_DELETE_ROW} END'
+    ),
+    f'{TABLE}_update': (
+        'AFTER UPDATE OF text ON posts_post '
+        f'BEGIN {_DELETE_ROW} {_INSERT_ROW} END'
+    ),
+}
+
+SEARCH_ORDERING = ('rank', '-id')
+
+WORD_RE = re.compile(r'\w+')
+
+
+def ensure_index(using=DEFAULT_DB_ALIAS, **kwargs):
+    """Создаёт недостающие триггеры и тогда же перестраивает индекс.
+
+    Подключён к post_migrate; без таблицы индекса ничего не делает.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        if TABLE not in connection.introspection.table_names(cursor):
+            return
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' "
+            "AND tbl_name = 'posts_post'"
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+        missing = [name for name in TRIGGERS if name not in existing]
+        for name in missing:
+            cursor.execute(f'CREATE TRIGGER {name} {TRIGGERS[name]}')
+        if missing:
+            cursor.execute(REBUILD_SQL)
+
+
+def drop_triggers(using=DEFAULT_DB_ALIAS):
+    with connections[using].cursor() as cursor:
+        for name in TRIGGERS:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+
+
+def fts_query(text):
+    """Запрос FTS5 из пользовательского ввода.
+
+    Каждое слово берётся в кавычки, чтобы операторы и скобки из ввода не
+    ломали синтаксис MATCH; последнее слово ищется по префиксу.
+    """
+    words = WORD_RE.findall(text)
+    if not words:
+        return ''
+    return ' '.join(f'"{word}"' for word in words) + '*'
+
+
+def search_posts(text, group=None, author=None):
+    """Посты по запросу, от самых релевантных; пусто для пустого запроса.
+
+    Упорядочивать результат нужно по SEARCH_ORDERING.
+    """
+    query = fts_query(text)
+    if not query:
+        return Post.objects.none()
+    posts = Post.objects.filter(search__text__match=query).annotate(
+        rank=F('search__rank')
+    )
+    if group is not None:
+        posts = posts.filter(group=group)
+    if author is not None:
+        posts = posts.filter(author=author)
+    return posts.select_related('author', 'group').defer('text', 'text_html')
@@ -0,0 +1,159 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from core.page_cache import bump
+
+from . import cache, counts, images, thumbnails, timeline
+from .models import Comment, Follow, Group, Post, UserCounters
+
+User = get_user_model()
+
+
+@receiver(pre_save, sender=Post)
+def post_pre_save(sender, instance, raw=False, **kwargs):
+    instance._previous_group_id = None
+    instance._previous_image = None
+    if instance.pk and not raw:
+        instance._previous_group_id, instance._previous_image = (
+            Post.objects.filter(pk=instance.pk).values_list(
+                'group_id', 'image'
+            ).first() or (None, None)
+        )
+    if raw:
+        return
+    if not instance.image:
+        images.fill(instance, None)
+    elif not instance.image._committed:
+        # Новая загрузка ещё в памяти или во временном файле: читаем её
+        # до того, как FileField сохранит файл в хранилище.
+        images.fill(instance, instance.image)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous_group_id = getattr(instance, '_previous_group_id', None)
+    cache.invalidate_posts(
+        [instance.author_id],
+        [instance.group_id, previous_group_id],
+        [instance.pk],
+    )
+    cache.invalidate_cards([instance.pk])
+    if instance.image and instance.image.name != getattr(
+        instance, '_previous_image', None
+    ):
+        thumbnails.schedule(instance.image.name)
+    if created:
+        timeline.fan_out(instance)
+        counts.adjust([counts.ALL_POSTS_KEY], 1)
+        with transaction.atomic():
+            counts.change_group(instance.group_id, 1)
+            counts.change_user(instance.author_id, posts_count=1)
+        return
+    if previous_group_id != instance.group_id:
+        with transaction.atomic():
+            counts.change_group(previous_group_id, -1)
+            counts.change_group(instance.group_id, 1)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counts.adjust([counts.ALL_POSTS_KEY], -1)
+    counts.change_group(instance.group_id, -1)
+    counts.change_user(instance.author_id, posts_count=-1)
+    cache.invalidate_posts(
+        [instance.author_id], [instance.group_id], [instance.pk]
+    )
+    cache.invalidate_cards([instance.pk])
+
+
+@receiver(pre_save, sender=Group)
+def group_pre_save(sender, instance, raw=False, **kwargs):
+    instance._previous_slug = instance._previous_title = None
+    if instance.pk and not raw:
+        instance._previous_slug, instance._previous_title = (
+            Group.objects.filter(pk=instance.pk).values_list(
+                'slug', 'title'
+            ).first() or (None, None)
+        )
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous_slug = getattr(instance, '_previous_slug', None)
+    previous_title = getattr(instance, '_previous_title', None)
+    bump(*(
+        cache.group_scope(slug)
+        for slug in {instance.slug, previous_slug} if slug
+    ))
+    if previous_slug is None or (previous_slug, previous_title) == (
+        instance.slug, instance.title
+    ):
+        return
+    # Название и ссылка на группу есть на страницах и в карточках её
+    # постов: сбрасываем их, как при удалении группы.
+    posts = list(instance.posts.values_list('pk', 'author_id'))
+    post_ids = [pk for pk, author_id in posts]
+    cache.invalidate_posts(
+        {author_id for pk, author_id in posts}, [instance.pk], post_ids
+    )
+    cache.invalidate_cards(post_ids)
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    # Посты группы останутся без неё: сбрасываем и страницы их авторов.
+    cache.invalidate_posts(
+        instance.posts.order_by().values_list(
+            'author_id', flat=True
+        ).distinct(),
+        [instance.pk],
+    )
+    cache.invalidate_cards(instance.posts.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        counts.change_comments(instance.post_id, 1)
+    bump(cache.post_scope(instance.post_id))
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counts.change_comments(instance.post_id, -1)
+    bump(cache.post_scope(instance.post_id))
+
+
+def _change_follow_counters(follow, delta):
+    with transaction.atomic():
+        counts.change_user(follow.author_id, followers_count=delta)
+        counts.change_user(follow.user_id, following_count=delta)
+    cache.invalidate_profiles(follow.author_id, follow.user_id)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.backfill(instance.user_id, instance.author_id)
+        _change_follow_counters(instance, 1)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    timeline.trim(instance.user_id, instance.author_id)
+    _change_follow_counters(instance, -1)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserCounters.objects.get_or_create(user=instance)
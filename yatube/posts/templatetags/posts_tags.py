@@ -0,0 +1,63 @@
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+
+from posts import thumbnails
+from posts.cache import card_key
+from posts.forms import CommentForm
+from posts.models import Follow
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def is_following(context, author_username):
+    """Подписан ли текущий пользователь на автора."""
+    user = context.get('user')
+    if user is None or not user.is_authenticated:
+        return False
+    return Follow.objects.filter(
+        user=user, author__username=author_username
+    ).exists()
+
+
+@register.simple_tag
+def comment_form():
+    return CommentForm()
+
+
+@register.simple_tag
+def post_card(post, show_author=True):
+    """Карточка поста для лент; готовый HTML берётся из кэша.
+
+    Карточка не зависит от пользователя, поэтому одна копия обслуживает
+    главную, группы, профили и ленту подписок.
+    """
+    key = card_key(post.pk, show_author)
+    html = cache.get(key)
+    if html is None:
+        html = render_to_string(
+            'posts/includes/post_card.html',
+            {'post': post, 'show_author': show_author},
+        )
+        cache.set(key, html, settings.POST_CARD_CACHE_TIMEOUT)
+    return html
+
+
+@register.simple_tag
+def thumbnail_preset(post, preset):
+    """Готовая миниатюра пресета или заглушка; рендер не ресайзит.
+
+    Миниатюры, найденные заранее thumbnails.prefetch, берутся из поста.
+    """
+    if not post.image:
+        return None
+    prefetched = getattr(post, 'thumbnails', {})
+    if preset in prefetched:
+        thumbnail = prefetched[preset]
+    else:
+        thumbnail = thumbnails.cached_thumbnail(post.image, preset)
+    if thumbnail is None or not thumbnail.complete:
+        thumbnails.schedule(post.image.name)
+    return thumbnail or thumbnails.placeholder(post, preset)
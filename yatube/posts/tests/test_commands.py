@@ -0,0 +1,183 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+
+from ..management.commands.explain_views import explain, plan_problems
+from ..models import Comment, Follow, Group, ImportCheckpoint, Post
+from ..rendering import RENDERER_VERSION
+
+User = get_user_model()
+
+
+class ExplainViewsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='-'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for i in range(15):
+            post = Post.objects.create(
+                text=f'Пост {i}', author=cls.author, group=cls.group
+            )
+            Comment.objects.create(post=post, author=cls.reader, text='!')
+
+    def test_view_queries_use_indexes(self):
+        out = StringIO()
+        call_command('explain_views', verbosity=2, stdout=out)
+        self.assertIn('SEARCH', out.getvalue())
+
+    def test_full_scan_and_temp_sort_are_reported(self):
+        plan = explain(
+            'SELECT * FROM posts_post ORDER BY text'
+        )
+        self.assertEqual(len(plan_problems(plan)), 2, plan)
+
+
+class RerenderHtmlTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(
+            text='<script>\n\nАбзац', author=cls.user
+        )
+        cls.comment = Comment.objects.create(
+            post=cls.post, author=cls.user, text='a & b'
+        )
+
+    def test_html_is_rendered_on_save(self):
+        self.assertEqual(
+            self.post.text_html, '<p>&lt;script&gt;</p>\n\n<p>Абзац</p>'
+        )
+        self.assertEqual(self.post.html_version, RENDERER_VERSION)
+        self.assertEqual(self.comment.text_html, '<p>a &amp; b</p>')
+
+    def test_stale_html_is_rerendered(self):
+        Post.objects.update(text_html='старый', html_version=0)
+        Comment.objects.update(text_html='старый', html_version=0)
+        out = StringIO()
+        call_command('rerender_html', batch_size=1, stdout=out)
+        self.assertIn('постов: 1, комментариев: 1', out.getvalue())
+        post = Post.objects.get(pk=self.post.pk)
+        comment = Comment.objects.get(pk=self.comment.pk)
+        self.assertEqual(post.text_html, self.post.text_html)
+        self.assertEqual(post.html_version, RENDERER_VERSION)
+        self.assertEqual(comment.text_html, self.comment.text_html)
+
+
+class ImportPostsTests(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'data.ndjson')
+
+    def write(self, records):
+        with open(self.path, 'w', encoding='utf-8') as stream:
+            for record in records:
+                stream.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def run_import(self, *args):
+        call_command('import_posts', self.path, *args, stdout=StringIO())
+
+    def test_import_fills_counters_and_timeline(self):
+        self.write([
+            {'type': 'group', 'slug': 'cats', 'title': 'Коты'},
+            {'type': 'follow', 'user': 'reader', 'author': 'writer'},
+            {'type': 'post', 'id': 7, 'text': 'Пост', 'author': 'writer',
+             'group': 'cats', 'pub_date': '2020-05-01T10:00:00'},
+            {'type': 'comment', 'post': 7, 'author': 'reader',
+             'text': 'Ответ'},
+        ])
+        self.run_import('--batch-size', '2')
+        post = Post.objects.get(pk=7)
+        self.assertEqual(post.pub_date.year, 2020)
+        self.assertEqual(post.excerpt_html, '<p>Пост</p>')
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(post.group.posts_count, 1)
+        reader = User.objects.get(username='reader')
+        self.assertFalse(reader.has_usable_password())
+        self.assertEqual(reader.counters.following_count, 1)
+        self.assertEqual(post.author.counters.posts_count, 1)
+        self.assertTrue(reader.timeline.filter(post=post).exists())
+
+    def test_failed_import_resumes_from_checkpoint(self):
+        records = [
+            {'type': 'post', 'text': f'Пост {i}', 'author': 'writer'}
+            for i in range(4)
+        ]
+        self.write(records + [{'type': 'post', 'author': 'writer'}])
+        with self.assertRaisesMessage(CommandError, 'Запись 5'):
+            self.run_import('--batch-size', '2')
+        self.assertEqual(Post.objects.count(), 4)
+        self.assertEqual(ImportCheckpoint.objects.get().position, 4)
+        records.append({'type': 'post', 'text': 'Пост 4', 'author': 'writer'})
+        self.write(records)
+        self.run_import('--batch-size', '2')
+        self.assertEqual(Post.objects.count(), 5)
+        self.run_import()
+        self.assertEqual(Post.objects.count(), 5)
+
+    def test_csv_input(self):
+        self.path = self.path.replace('.ndjson', '.csv')
+        with open(self.path, 'w', encoding='utf-8') as stream:
+            stream.write('type,text,author,user\n'
+                         'post,"Первый, с запятой",writer,\n'
+                         'follow,,writer,reader\n')
+        self.run_import()
+        self.assertTrue(Post.objects.filter(text='Первый, с запятой').exists())
+        self.assertTrue(
+            Follow.objects.filter(user__username='reader').exists()
+        )
+
+
+class ExportPostsTests(TestCase):
+    def test_export_can_be_imported_back(self):
+        user = User.objects.create_user(username='author')
+        Post.objects.create(text='Первый пост', author=user)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'author.csv')
+        call_command('export_posts', 'author', format='csv', output=path)
+        Post.objects.all().delete()
+        call_command('import_posts', path, stdout=StringIO())
+        self.assertEqual(Post.objects.get().text, 'Первый пост')
+
+
+class DescribeImagesTests(TestCase):
+    def test_fills_image_info_for_old_posts(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        gif = (
+            b'\x47\x49\x46\x38\x39\x61\x02\x00\x01\x00\x80\x00\x00\x00'
+            b'\x00\x00\xFF\xFF\xFF\x21\xF9\x04\x00\x00\x00\x00\x00\x2C'
+            b'\x00\x00\x00\x00\x02\x00\x01\x00\x00\x02\x02\x0C\x0A\x00'
+            b'\x3B'
+        )
+        user = User.objects.create_user(username='author')
+        with override_settings(MEDIA_ROOT=media_root):
+            post = Post.objects.create(
+                text='Фото', author=user,
+                image=SimpleUploadedFile('old.gif', gif, 'image/gif'),
+            )
+            Post.objects.create(text='Пропал', author=user, image='gone.gif')
+            Post.objects.filter(pk=post.pk).update(
+                image_width=None, image_height=None, image_color='',
+                image_lqip='',
+            )
+            out = StringIO()
+            call_command('describe_images', stdout=out)
+        post.refresh_from_db()
+        self.assertEqual((post.image_width, post.image_height), (2, 1))
+        self.assertTrue(post.image_lqip)
+        self.assertIn('Описано картинок: 1, пропущено: 1.', out.getvalue())
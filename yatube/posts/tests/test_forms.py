@@ -1,6 +1,7 @@
 import os
 import shutil
 import tempfile
+from io import BytesIO
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
@@ -8,6 +9,7 @@ from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from django.core.cache import cache
+from PIL import Image
 
 from ..forms import PostForm
 from ..models import Group, Post, Comment, Follow
@@ -47,6 +49,7 @@ class PostCreateFormTests(TestCase):
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
     def setUp(self):
+        cache.clear()
         self.authorized_client = Client()
         self.authorized_client.force_login(
             User.objects.get(username='Vasya')
@@ -180,6 +183,7 @@ class PostCreateFormTests(TestCase):
             )
         )
 
+        cache.clear()
         response = self.authorized_client.get(
             reverse(
                 'posts:post_detail',
@@ -193,17 +197,31 @@ class PostCreateFormTests(TestCase):
         self.assertEqual(comment[0] in response.context['comments'], True)
 
     def test_cache_of_posts_on_home_page(self):
-        """Проверяем, что посты на главной странице кэшируются"""
+        """Главная берётся из кэша, пока посты не менялись."""
         response = self.authorized_client.get(reverse('posts:index'))
         cached_page_01 = response.content
-        self.post02.delete()
+        # update() обходит сигналы: страница остаётся закэшированной.
+        # Лента показывает сохранённое начало текста — меняем и его.
+        Post.objects.filter(pk=self.post02.pk).update(
+            text='Изменён тайно', excerpt_html='<p>Изменён тайно</p>'
+        )
         response = self.authorized_client.get(reverse('posts:index'))
-        cached_page_02 = response.content
-        self.assertEqual(cached_page_01, cached_page_02)
+        self.assertEqual(cached_page_01, response.content)
         cache.clear()
         response = self.authorized_client.get(reverse('posts:index'))
         self.assertNotEqual(cached_page_01, response.content)
 
+    def test_home_page_cache_invalidated_on_post_change(self):
+        """Удалённый и новый посты сразу видны на главной."""
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, self.post02.text)
+        self.post02.delete()
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertNotContains(response, self.post02.text)
+        Post.objects.create(text='Свежий пост', author=self.user)
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Свежий пост')
+
     def test_authorized_user_follow(self):
         """Авторизованный пользователь может подписаться и отписаться"""
         self.authorized_client = Client()
@@ -243,3 +261,68 @@ class PostCreateFormTests(TestCase):
             reverse('posts:profile_follow', args=[self.user02.username]))
         response = Follow.objects.filter(user=self.user02).count()
         self.assertEqual(response, 1)
+
+
+def image_upload(name, size, image_format, **options):
+    file = BytesIO()
+    Image.effect_noise(size, 64).convert('RGB').save(
+        file, image_format, **options
+    )
+    file.name = name
+    file.seek(0)
+    return file
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageUploadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='photographer')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def post_image(self, image):
+        return self.client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Фото', 'image': image},
+        )
+
+    def test_upload_over_byte_limit_is_rejected(self):
+        with override_settings(UPLOAD_MAX_BYTES=1024):
+            response = self.post_image(
+                image_upload('big.png', (100, 100), 'PNG')
+            )
+        form = response.context['form']
+        self.assertTrue(form.has_error('image', 'file_too_large'))
+        self.assertFalse(Post.objects.exists())
+
+    def test_image_over_pixel_limit_is_rejected(self):
+        with override_settings(UPLOAD_IMAGE_MAX_PIXELS=100):
+            response = self.post_image(
+                image_upload('wide.png', (20, 20), 'PNG')
+            )
+        form = response.context['form']
+        self.assertTrue(form.has_error('image', 'too_many_pixels'))
+        self.assertFalse(Post.objects.exists())
+
+    def test_original_is_rotated_downscaled_and_stripped(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Повёрнута на 90° по часовой.
+        exif[0x010F] = 'Camera'
+        with override_settings(UPLOAD_IMAGE_MAX_SIDE=300):
+            self.post_image(image_upload(
+                'photo.jpg', (900, 300), 'JPEG', exif=exif.tobytes()
+            ))
+        post = Post.objects.get()
+        self.assertEqual((post.image_width, post.image_height), (100, 300))
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (100, 300))
+            self.assertEqual(image.format, 'JPEG')
+            self.assertNotIn('exif', image.info)
@@ -1,7 +1,7 @@
 from django.contrib.auth import get_user_model
 from django.test import TestCase
 
-from ..models import Group, Post
+from ..models import Comment, Group, Post
 
 User = get_user_model()
 
@@ -33,3 +33,24 @@ class PostModelTest(TestCase):
             str(post), post.text[:15],
             'В модели Post не корректно работает __str__'
         )
+
+
+class CountersTest(TestCase):
+    def test_stale_save_keeps_counters(self):
+        """Сохранение старого экземпляра не затирает счётчики."""
+        user = User.objects.create_user(username='writer')
+        group = Group.objects.create(title='Группа', slug='group')
+        post = Post.objects.create(text='Пост', author=user, group=group)
+        stale_post = Post.objects.get(pk=post.pk)
+        stale_group = Group.objects.get(pk=group.pk)
+        Comment.objects.create(post=post, author=user, text='Раз')
+        Comment.objects.create(post=post, author=user, text='Два')
+        Post.objects.create(text='Ещё', author=user, group=group)
+        stale_post.text = 'Правка'
+        stale_post.save()
+        stale_group.save()
+        post.refresh_from_db()
+        group.refresh_from_db()
+        self.assertEqual(post.text, 'Правка')
+        self.assertEqual(post.comments_count, 2)
+        self.assertEqual(group.posts_count, 2)
@@ -1,15 +1,34 @@
+import base64
+import json
 import os
 import shutil
 import tempfile
+import zipfile
+from io import BytesIO, StringIO
+from unittest import mock
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.test import TestCase, Client, override_settings
 from django.urls import reverse
+from django.utils.html import linebreaks
 from django import forms
 from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+import sorl
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.images import ImageFile
 
-from posts.models import Post, Group
+from core.page_cache import bump
+from core.testing import QueryBudgetTestMixin
+from posts import counts, search, thumbnail_store, thumbnails
+from posts.cache import INDEX
+from posts.models import (
+    Comment, Follow, Group, Post, TimelineEntry, UserCounters,
+)
+from posts.rendering import render_text
 from django.core.files.uploadedfile import SimpleUploadedFile
 
 User = get_user_model()
@@ -64,6 +83,8 @@ class PostURLTests(TestCase):
             )
         )
         Post.objects.bulk_create(cls.post_list)
+        # bulk_create не шлёт сигналов: счётчики пересчитываем сами.
+        counts.rebuild_all()
 
     @classmethod
     def tearDownClass(cls):
@@ -71,6 +92,8 @@ class PostURLTests(TestCase):
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
     def setUp(self):
+        # Посты созданы bulk_create без сигналов — счётчики в кэше неверны.
+        cache.clear()
         self.authorized_client = Client()
         self.authorized_client.force_login(
             User.objects.get(username='Vasya')
@@ -159,6 +182,118 @@ class PostURLTests(TestCase):
             scd_pag_num
         )
 
+    def test_group_list_cursor_pages(self):
+        """Курсорная пагинация листает вперёд и назад без пропусков."""
+        url = reverse('posts:group_list', args=[self.group.slug])
+        first = self.client.get(url + '?cursor=').context['page_obj']
+        self.assertEqual(len(first), settings.NUMBER_OF_POSTS)
+        self.assertFalse(first.has_previous())
+        second = self.client.get(
+            url + f'?cursor={first.next_cursor}').context['page_obj']
+        self.assertEqual(len(second), 2)
+        self.assertFalse(second.has_next())
+        back = self.client.get(
+            url + f'?cursor={second.previous_cursor}').context['page_obj']
+        self.assertEqual(list(back), list(first))
+        self.assertEqual(
+            [post.pk for post in list(first) + list(second)],
+            list(self.group.posts.order_by('-pub_date', '-id')
+                 .values_list('pk', flat=True))
+        )
+
+    def test_broken_cursor_shows_first_page(self):
+        forged = [
+            ['n', [{'dt': '2020-13-45T00:00:00'}, 1]],
+            ['n', [{'dt': '2020-01-01T00:00:00'}, 'abc']],
+            ['n', [[1], 1]],
+            ['n', [5, 1]],
+            ['n', [{'dt': 5}, 1]],
+            {'n': 1, 'p': 2},
+        ]
+        cursors = ['broken'] + [
+            base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+            for payload in forged
+        ]
+        for cursor in cursors:
+            with self.subTest(cursor=cursor):
+                response = self.client.get(
+                    reverse('posts:profile', args=[self.user.username]),
+                    {'cursor': cursor},
+                )
+                self.assertEqual(
+                    len(response.context['page_obj']),
+                    settings.NUMBER_OF_POSTS,
+                )
+
+    def test_group_count_follows_post_changes(self):
+        """Счётчик группы меняется вместе с постами."""
+        url = reverse('posts:group_list', args=[self.group.slug])
+        response = self.client.get(url)
+        self.assertEqual(response.context['page_obj'].paginator.count, 12)
+        post = Post.objects.create(
+            text='Ещё пост', author=self.user, group=self.group)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 13)
+        post.group = self.group2
+        post.save()
+        response = self.client.get(url)
+        self.assertEqual(response.context['page_obj'].paginator.count, 12)
+        post.delete()
+        self.group2.refresh_from_db()
+        self.assertEqual(self.group2.posts_count, 1)
+
+    def test_counters_follow_comments_and_follows(self):
+        """Счётчики комментариев и подписок обновляются сигналами."""
+        post = self.post_list[0]
+        comment = Comment.objects.create(
+            post=post, author=self.user2, text='Комментарий'
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+
+        Follow.objects.create(user=self.user2, author=self.user)
+        response = self.client.get(
+            reverse('posts:profile', args=[self.user.username])
+        )
+        self.assertEqual(response.context['counters'].followers_count, 1)
+        self.user2.counters.refresh_from_db()
+        self.assertEqual(self.user2.counters.following_count, 1)
+        Follow.objects.filter(user=self.user2).delete()
+        self.user.counters.refresh_from_db()
+        self.assertEqual(self.user.counters.followers_count, 0)
+
+    def test_missing_counters_are_computed_without_writes(self):
+        """Без строки счётчиков профиль считает их, ничего не записывая."""
+        Follow.objects.create(user=self.user2, author=self.user)
+        UserCounters.objects.filter(user=self.user).delete()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('posts:profile', args=[self.user.username])
+            )
+        counters = response.context['counters']
+        self.assertEqual(counters.posts_count, self.user.posts.count())
+        self.assertEqual(counters.followers_count, 1)
+        self.assertFalse(
+            UserCounters.objects.filter(user=self.user).exists()
+        )
+        self.assertFalse(any(
+            query['sql'].startswith(('INSERT', 'UPDATE'))
+            for query in queries
+        ))
+
+    def test_repair_counters_rebuilds_drifted_values(self):
+        """repair_counters возвращает счётчики к данным в базе."""
+        Group.objects.update(posts_count=100)
+        self.user.counters.delete()
+        call_command('repair_counters', stdout=StringIO())
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 12)
+        user = User.objects.get(pk=self.user.pk)
+        self.assertEqual(user.counters.posts_count, 12)
+
     def test_post_detail_page_show_correct_context(self):
         """Шаблон group_list сформирован с правильным контекстом."""
         response = self.authorized_client.get(
@@ -232,3 +367,629 @@ class PostURLTests(TestCase):
         objects = response.context['post']
         post_image = objects.image
         self.assertNotEqual(post_image.name, '')
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.author = User.objects.create_user(username='Writer')
+        cls.old_post = Post.objects.create(
+            text='Пост до подписки',
+            author=cls.author,
+        )
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def test_follow_backfills_and_new_posts_fan_out(self):
+        """Подписка наполняет ленту, новые посты попадают в неё сразу."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        new_post = Post.objects.create(text='Новый пост', author=self.author)
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            list(response.context['page_obj']),
+            [new_post, self.old_post]
+        )
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 2
+        )
+        first = self.authorized_client.get(
+            reverse('posts:follow_index') + '?cursor=').context['page_obj']
+        self.assertEqual(list(first), [new_post, self.old_post])
+        self.assertFalse(first.has_other_pages())
+
+    @override_settings(NUMBER_OF_POSTS=2)
+    def test_cursor_pages_through_feed(self):
+        """Курсор ленты с датой в аннотации ведёт на следующую страницу."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        for i in range(3):
+            Post.objects.create(text=f'Пост {i}', author=self.author)
+        url = reverse('posts:follow_index')
+        first = self.authorized_client.get(
+            url + '?cursor=').context['page_obj']
+        second = self.authorized_client.get(
+            url, {'cursor': first.next_cursor}).context['page_obj']
+        self.assertEqual(len(first), 2)
+        self.assertEqual(len(second), 2)
+        self.assertFalse(set(first) & set(second))
+        self.assertEqual(list(second)[-1], self.old_post)
+
+    def test_unfollow_trims_timeline(self):
+        """Отписка убирает посты автора из ленты."""
+        self.authorized_client.get(
+            reverse('posts:profile_follow', args=[self.author.username]))
+        self.authorized_client.get(
+            reverse('posts:profile_unfollow', args=[self.author.username]))
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.reader).exists()
+        )
+
+
+class PageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Holder')
+        cls.author = User.objects.create_user(username='Author')
+        cls.post = Post.objects.create(text='Текст', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_cached_page_is_personalised_per_request(self):
+        """Общая страница из кэша получает шапку текущего пользователя."""
+        url = reverse('posts:profile', args=[self.author.username])
+        response = self.authorized_client.get(url)
+        self.assertContains(response, 'Пользователь: Holder')
+        self.assertContains(response, 'Подписаться')
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertNotContains(response, 'Пользователь: Holder')
+        self.assertNotContains(response, 'Подписаться')
+        self.assertContains(response, 'Регистрация')
+
+    def test_follow_button_state_is_not_cached(self):
+        url = reverse('posts:profile', args=[self.author.username])
+        self.authorized_client.get(url)
+        Follow.objects.create(user=self.user, author=self.author)
+        response = self.authorized_client.get(url)
+        self.assertContains(response, 'Отписаться')
+
+    @override_settings(PAGE_CACHE_TIMEOUT=0, PAGE_CACHE_LOCK_WAIT=0)
+    def test_stale_page_served_while_another_request_rebuilds(self):
+        """Пока блокировку держит другой запрос, отдаётся старая копия."""
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        self.client.get(url)
+        Post.objects.filter(pk=self.post.pk).update(text='Обновлённый')
+        with mock.patch.object(cache, 'add', return_value=False):
+            with self.assertNumQueries(0):
+                response = self.client.get(url)
+        self.assertNotContains(response, 'Обновлённый')
+        response = self.client.get(url)
+        self.assertContains(response, 'Обновлённый')
+
+    def test_last_modified_only_for_anonymous(self):
+        """Пользователь не получает 304 по одному If-Modified-Since."""
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        anonymous = self.client.get(url)
+        response = self.authorized_client.get(url)
+        self.assertFalse(response.has_header('Last-Modified'))
+        response = self.authorized_client.get(
+            url, HTTP_IF_MODIFIED_SINCE=anonymous['Last-Modified']
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_etag_changes_with_csrf_token(self):
+        """После смены CSRF-токена страница с формой рендерится заново."""
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        cookies = self.authorized_client.cookies
+        cookies[settings.CSRF_COOKIE_NAME] = 'a' * 64
+        etag = self.authorized_client.get(url)['ETag']
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        cookies[settings.CSRF_COOKIE_NAME] = 'b' * 64
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_post_page_survives_unrelated_posts(self):
+        """Чужой новый пост не сбрасывает страницу поста, свой — сбрасывает."""
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        etag = self.client.get(url)['ETag']
+        other = User.objects.create_user(username='other_author')
+        Post.objects.create(text='Чужой пост', author=other)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Post.objects.create(text='Ещё пост автора', author=self.post.author)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_group_rename_refreshes_post_pages(self):
+        """Новые название и адрес группы видны на страницах её постов."""
+        group = Group.objects.create(
+            title='Старая', slug='old-slug', description='-'
+        )
+        post = Post.objects.create(
+            text='Пост группы', author=self.author, group=group
+        )
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:post_detail', args=[post.pk]),
+        ]
+        for url in urls:
+            self.client.get(url)
+        group.slug = 'new-slug'
+        group.title = 'Новая'
+        group.save()
+        new_link = reverse('posts:group_list', args=['new-slug'])
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertContains(response, new_link)
+                self.assertNotContains(response, 'old-slug')
+        response = self.client.get(urls[-1])
+        self.assertContains(response, 'Группа: Новая')
+
+    def test_post_card_cached_until_post_edit(self):
+        """Карточка берётся из кэша и пересобирается после правки."""
+        self.client.get(reverse('posts:index'))
+        Post.objects.filter(pk=self.post.pk).update(text='Тайная правка')
+        bump(INDEX)
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotContains(response, 'Тайная правка')
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Честная правка'
+        post.save()
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Честная правка')
+
+    def test_conditional_get_returns_not_modified(self):
+        """Повторный запрос с ETag получает 304 без рендеринга."""
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        Comment.objects.create(post=self.post, author=self.user, text='Да')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+class QueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    """Число запросов страниц не зависит от числа постов на них."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.posts = []
+        for i in range(settings.NUMBER_OF_POSTS + 2):
+            author = User.objects.create_user(username=f'author{i}')
+            group = Group.objects.create(
+                title=f'Группа {i}', slug=f'group-{i}', description='-'
+            )
+            Follow.objects.create(user=cls.reader, author=author)
+            # Файлов нет: страницам нужны только ключи миниатюр.
+            post = Post.objects.create(text='Текст', author=author,
+                                       group=group, image=f'posts/{i}.gif')
+            Comment.objects.create(post=post, author=cls.reader, text='!')
+            Comment.objects.create(post=post, author=author, text='?')
+            cls.posts.append(post)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def test_views_stay_within_query_budget(self):
+        post = self.posts[0]
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[post.group.slug]),
+            reverse('posts:profile', args=[post.author.username]),
+            reverse('posts:post_detail', args=[post.pk]),
+            reverse('posts:post_comments', args=[post.pk]),
+            reverse('posts:follow_index'),
+            reverse('posts:search') + f'?q=Текст&group={post.group.slug}'
+            + f'&author={post.author.username}',
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertWithinQueryBudget(self.client, url)
+                cache.clear()
+                self.assertWithinQueryBudget(self.authorized_client, url)
+
+
+@override_settings(COMMENTS_PER_PAGE=3)
+class CommentPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='commenter')
+        cls.post = Post.objects.create(text='Пост', author=cls.user)
+        cls.comments = [
+            Comment.objects.create(
+                post=cls.post, author=cls.user, text=f'Комментарий {i}'
+            )
+            for i in range(7)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_post_detail_renders_first_page_only(self):
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk])
+        )
+        page = response.context['comments']
+        self.assertEqual(
+            list(page), self.comments[::-1][:3]
+        )
+        self.assertTrue(page.has_next())
+        self.assertContains(
+            response, reverse('posts:post_comments', args=[self.post.pk])
+        )
+
+    def test_fragment_pages_walk_all_comments(self):
+        url = reverse('posts:post_comments', args=[self.post.pk])
+        seen = []
+        cursor = ''
+        while True:
+            response = self.client.get(url, {'cursor': cursor})
+            self.assertTemplateUsed(response, 'includes/comments_page.html')
+            page = response.context['comments']
+            seen += list(page)
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, self.comments[::-1])
+        self.assertNotContains(response, 'data-comments-more')
+
+
+@override_settings(POST_EXCERPT_LENGTH=20)
+class ExcerptTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='writer')
+        cls.long_text = 'Очень длинный текст поста. ' * 50
+        cls.post = Post.objects.create(text=cls.long_text, author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_excerpt_is_stored_on_save(self):
+        self.assertEqual(len(self.post.excerpt), 20)
+        self.assertTrue(self.post.excerpt_html.startswith('<p>'))
+        Post.objects.bulk_create([Post(text='<b>раз</b>', author=self.user)])
+        post = Post.objects.get(text='<b>раз</b>')
+        self.assertEqual(post.excerpt_html, '<p>&lt;b&gt;раз&lt;/b&gt;</p>')
+
+    def test_short_excerpt_reuses_text_html(self):
+        with mock.patch(
+            'posts.rendering.linebreaks', wraps=linebreaks
+        ) as render:
+            post = Post.objects.create(text='Коротко', author=self.user)
+        render.assert_called_once_with('Коротко', autoescape=True)
+        self.assertEqual(post.excerpt_html, post.text_html)
+        self.assertEqual(
+            self.post.excerpt_html,
+            render_text(self.post.excerpt),
+        )
+
+    def test_list_pages_do_not_read_full_text(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, self.post.excerpt_html, html=True)
+        self.assertNotContains(response, self.long_text)
+        self.assertFalse(any(
+            '"posts_post"."text"' in query['sql'] for query in queries
+        ))
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk])
+        )
+        self.assertContains(response, self.long_text.strip())
+
+
+@override_settings(NUMBER_OF_POSTS=2)
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='searcher')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Коты', slug='cats', description='-'
+        )
+        cls.best = Post.objects.create(
+            text='Кот кот кот', author=cls.user, group=cls.group
+        )
+        cls.posts = [cls.best] + [
+            Post.objects.create(
+                text=f'Котлета и кот, рецепт {i}', author=cls.other
+            )
+            for i in range(3)
+        ]
+        Post.objects.create(text='Про собак', author=cls.user)
+
+    def search(self, **params):
+        response = self.client.get(reverse('posts:search'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.context['page_obj']
+
+    def test_results_are_ranked_and_paginated(self):
+        seen = []
+        cursor = ''
+        while True:
+            page = self.search(q='кот', cursor=cursor)
+            seen += list(page)
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen[0], self.best)
+        self.assertCountEqual(seen, self.posts)
+
+    def test_filters_by_group_and_author(self):
+        self.assertEqual(
+            list(self.search(q='кот', group='cats')), [self.best]
+        )
+        self.assertEqual(
+            len(self.search(q='кот', author='other')), 2
+        )
+
+    def test_index_follows_bulk_create_and_update(self):
+        Post.objects.bulk_create([Post(text='Жираф', author=self.user)])
+        self.assertEqual(len(self.search(q='жираф')), 1)
+        Post.objects.filter(text='Жираф').update(text='Зебра')
+        self.assertEqual(len(self.search(q='жираф')), 0)
+        Post.objects.filter(text='Зебра').delete()
+        self.assertEqual(len(self.search(q='зебра')), 0)
+
+    def test_query_syntax_is_not_passed_through(self):
+        page = self.search(q='"кот*(')
+        self.assertEqual(len(page), 2)
+        self.assertIsNone(self.search(q=''))
+
+    def test_missing_triggers_are_restored(self):
+        search.drop_triggers()
+        search.ensure_index()
+        Post.objects.create(text='Жираф', author=self.user)
+        self.assertEqual(len(self.search(q='жираф')), 1)
+
+    def test_admin_uses_index(self):
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'pass'
+        )
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'собак'}
+        )
+        self.assertEqual(response.context['cl'].result_count, 1)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, EXPORT_CHUNK_SIZE=2)
+class ExportTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='exporter')
+        cls.stranger = User.objects.create_user(username='stranger')
+        cls.group = Group.objects.create(
+            title='Группа', slug='export-group', description='-'
+        )
+        cls.image_post = Post.objects.create(
+            text='С картинкой', author=cls.user, group=cls.group,
+            image=SimpleUploadedFile('export.gif', b'GIF89a', 'image/gif'),
+        )
+        for i in range(3):
+            post = Post.objects.create(text=f'Пост {i}', author=cls.user)
+        Comment.objects.create(post=post, author=cls.user, text='Свой')
+        Comment.objects.create(post=post, author=cls.stranger, text='Чужой')
+        cls.url = reverse('posts:export', args=[cls.user.username])
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_only_owner_and_staff_can_export(self):
+        self.client.force_login(self.stranger)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.stranger.is_staff = True
+        self.stranger.save()
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_ndjson_export_is_streamed(self):
+        response = self.client.get(self.url)
+        self.assertTrue(response.streaming)
+        records = [
+            json.loads(line)
+            for line in b''.join(response.streaming_content).splitlines()
+        ]
+        self.assertEqual(
+            [record['type'] for record in records], ['post'] * 4 + ['comment']
+        )
+        self.assertEqual(records[0]['group'], 'export-group')
+        self.assertEqual(records[-1]['text'], 'Свой')
+
+    def test_csv_export(self):
+        response = self.client.get(self.url, {'format': 'csv'})
+        content = b''.join(response.streaming_content).decode()
+        self.assertTrue(content.startswith('type,id,post,author'))
+        self.assertEqual(len(content.splitlines()), 6)
+
+    def test_zip_export_bundles_images(self):
+        response = self.client.get(self.url, {'images': '1'})
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        archive = zipfile.ZipFile(
+            BytesIO(b''.join(response.streaming_content))
+        )
+        self.assertEqual(
+            archive.read(self.image_post.image.name), b'GIF89a'
+        )
+        self.assertIn(b'"type": "comment"', archive.read('exporter.ndjson'))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='photographer')
+        gif = (
+            b'\x47\x49\x46\x38\x39\x61\x02\x00\x01\x00\x80\x00\x00\x00'
+            b'\x00\x00\xFF\xFF\xFF\x21\xF9\x04\x00\x00\x00\x00\x00\x2C'
+            b'\x00\x00\x00\x00\x02\x00\x01\x00\x00\x02\x02\x0C\x0A\x00'
+            b'\x3B'
+        )
+        with mock.patch('posts.thumbnails.schedule') as schedule:
+            cls.post = Post.objects.create(
+                text='Фото', author=cls.user,
+                image=SimpleUploadedFile('photo.gif', gif, 'image/gif'),
+            )
+        cls.scheduled = schedule.call_args_list
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_upload_schedules_thumbnails(self):
+        self.assertEqual(self.scheduled, [mock.call(self.post.image.name)])
+
+    def test_upload_stores_image_info(self):
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual((post.image_width, post.image_height), (2, 1))
+        self.assertRegex(post.image_color, r'^#[0-9a-f]{6}$')
+        self.assertTrue(post.image_lqip.startswith('data:image/jpeg'))
+        with mock.patch('posts.thumbnails.schedule'):
+            response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, f'url({post.image_lqip})')
+
+    def test_placeholder_until_thumbnail_is_ready(self):
+        with mock.patch('posts.thumbnails.schedule') as schedule:
+            response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'aspect-ratio: 960 / 339')
+        self.assertNotContains(response, '<img class="card-img')
+        schedule.assert_called_with(self.post.image.name)
+        thumbnails.generate(self.post.image.name)
+        thumbnail = thumbnails.cached_thumbnail(self.post.image, 'card')
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:post_detail', args=[self.post.pk]),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertContains(response, thumbnail.url)
+
+    def test_list_pages_use_prefetched_thumbnails(self):
+        thumbnails.generate(self.post.image.name)
+        cache.clear()
+        with mock.patch('posts.thumbnails.cached_thumbnail') as single:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse('posts:index'))
+        single.assert_not_called()
+        self.assertContains(
+            response,
+            thumbnails.cached_thumbnail(self.post.image, 'card').url,
+        )
+        self.assertEqual(
+            sum('thumbnail_kvstore' in q['sql'] for q in queries), 1
+        )
+
+    def test_store_matches_sorl(self):
+        self.assertEqual(sorl.__version__, thumbnail_store.SORL_VERSION)
+        thumbnails.generate(self.post.image.name)
+        variants = thumbnails.variants('card')
+        files = [
+            thumbnail_store.thumbnail_file(
+                self.post.image, variant.geometry, **variant.options
+            )
+            for variant in variants
+        ]
+        self.assertEqual(
+            [file.name for file in files],
+            [
+                get_thumbnail(
+                    self.post.image, variant.geometry, **variant.options
+                ).name
+                for variant in variants
+            ],
+        )
+        missing = ImageFile('missing.jpg', default.storage)
+        for cold in (True, False):
+            if cold:
+                cache.clear()
+            with self.subTest(cold=cold):
+                found = thumbnail_store.lookup_many(files + [missing])
+                self.assertEqual(
+                    [file and file.name for file in found],
+                    [file.name for file in files] + [None],
+                )
+        self.assertEqual(
+            [file.name for file in found[:-1]],
+            [default.kvstore.get(file).name for file in files],
+        )
+
+    def test_cached_cards_skip_thumbnail_lookup(self):
+        thumbnails.generate(self.post.image.name)
+        self.client.get(reverse('posts:index'))
+        bump(INDEX)
+        with mock.patch('posts.thumbnails.lookup_many') as lookup:
+            response = self.client.get(reverse('posts:index'))
+        lookup.assert_not_called()
+        self.assertContains(
+            response,
+            thumbnails.cached_thumbnail(self.post.image, 'card').url,
+        )
+        with mock.patch(
+            'posts.thumbnails.lookup_many', wraps=thumbnail_store.lookup_many
+        ) as lookup:
+            self.client.get(
+                reverse('posts:profile', args=[self.user.username])
+            )
+        lookup.assert_called_once()
+
+    def test_card_lists_all_widths_in_srcset(self):
+        thumbnails.generate(self.post.image.name)
+        cache.clear()
+        response = self.client.get(reverse('posts:index'))
+        picture = thumbnails.cached_thumbnail(self.post.image, 'card')
+        self.assertTrue(picture.complete)
+        self.assertEqual(
+            [item.split()[1] for item in picture.srcset.split(', ')],
+            ['320w', '640w', '960w'],
+        )
+        self.assertContains(response, f'srcset="{picture.srcset}"')
+
+    def test_webp_variants_depend_on_pillow_support(self):
+        with mock.patch.object(thumbnails, 'WEBP_SUPPORTED', False):
+            self.assertEqual(
+                {variant.format for variant in thumbnails.variants('card')},
+                {'JPEG'},
+            )
+        with mock.patch.object(thumbnails, 'WEBP_SUPPORTED', True):
+            webp = [
+                variant for variant in thumbnails.variants('card')
+                if variant.format == 'WEBP'
+            ]
+        self.assertEqual(
+            [(v.geometry, v.options['format']) for v in webp],
+            [('320x113', 'WEBP'), ('640x226', 'WEBP'), ('960x339', 'WEBP')],
+        )
+        self.assertFalse(any(variant.main for variant in webp))
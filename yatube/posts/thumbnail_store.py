@@ -0,0 +1,73 @@
+"""Чтение готовых миниатюр sorl-thumbnail без их генерации.
+
+У sorl нет публичного способа узнать имя миниатюры, не создавая её, и
+прочитать хранилище ключей пачкой. Обе вещи опираются на внутренности
+sorl и собраны только здесь; SORL_VERSION — версия, с которой они
+сверены. После обновления sorl ThumbnailTests падают на сравнении версий,
+а заодно проверяют, что имена и значения совпадают с get_thumbnail и
+kvstore.get.
+"""
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+SORL_VERSION = '12.7.0'
+
+
+class _Backend(ThumbnailBackend):
+    def thumbnail_file(self, file_, geometry_string, **options):
+        # Параметры дополняются так же, как в get_thumbnail, иначе имя
+        # файла и ключ в хранилище разойдутся.
+        source = ImageFile(file_)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+
+_backend = _Backend()
+
+
+def thumbnail_file(file_, geometry_string, **options):
+    """Файл миниатюры, который создал бы get_thumbnail, без генерации."""
+    return _backend.thumbnail_file(file_, geometry_string, **options)
+
+
+def lookup_many(files):
+    """kvstore.get для списка файлов: один get_many кэша и один запрос.
+
+    Повторяет логику cached_db-хранилища sorl, включая запоминание
+    промахов; для других хранилищ ключей — по одному get на файл.
+    """
+    kvstore = default.kvstore
+    empty = cached_db_kvstore.EMPTY_VALUE
+    if not files or not isinstance(kvstore, cached_db_kvstore.KVStore):
+        return [kvstore.get(file) for file in files]
+    keys = [add_prefix(file.key) for file in files]
+    values = kvstore.cache.get_many(keys)
+    missing = [key for key in keys if key not in values]
+    if missing:
+        found = dict(KVStoreModel.objects.filter(
+            key__in=missing
+        ).values_list('key', 'value'))
+        fetched = {key: found.get(key, empty) for key in missing}
+        kvstore.cache.set_many(
+            fetched, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT
+        )
+        values.update(fetched)
+    return [
+        None if values[key] == empty
+        else deserialize_image_file(values[key])
+        for key in keys
+    ]
@@ -0,0 +1,186 @@
+"""Миниатюры картинок постов: именованные пресеты и фоновая генерация.
+
+Размеры задаются в settings.THUMBNAIL_PRESETS, шаблоны ссылаются на них по
+имени. Рендер шаблона картинку не ресайзит: тег thumbnail_preset только
+читает готовую миниатюру из хранилища ключей sorl. Если её ещё нет, тег
+ставит генерацию в фон и показывает заглушку. Загрузка картинки сразу
+ставит в фон все пресеты; когда они готовы, кэш карточек и страниц с этим
+постом сбрасывается.
+
+Каждый пресет — набор вариантов: несколько ширин с пропорциями пресета
+в основном формате и те же ширины в WebP, если Pillow собран с ним.
+Шаблон выводит их через <picture> и srcset, и браузер телефона берёт
+узкий файл вместо полноразмерного.
+"""
+from django.conf import settings
+from PIL import features
+from sorl.thumbnail import get_thumbnail
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.parsers import parse_geometry
+
+from core import tasks
+
+from . import cache
+from .models import Post
+from .thumbnail_store import lookup_many, thumbnail_file
+
+
+WEBP_SUPPORTED = features.check('webp')
+
+
+class Placeholder:
+    """Заглушка вместо ещё не готовой миниатюры."""
+    is_placeholder = True
+    url = ''
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+
+
+class Variant:
+    """Один файл пресета: ширина, формат и параметры для sorl."""
+
+    def __init__(self, width, image_format, geometry, options, main):
+        self.width = width
+        self.format = image_format
+        self.geometry = geometry
+        self.options = options
+        self.main = main
+
+
+class Picture:
+    """Готовые файлы пресета: основной для src и srcset по форматам."""
+    is_placeholder = False
+
+    def __init__(self, main, srcsets, sizes, complete):
+        self.url = main.url
+        self.width = main.width
+        self.height = main.height
+        self.srcset = srcsets.get(thumbnail_settings.THUMBNAIL_FORMAT, '')
+        self.webp_srcset = srcsets.get('WEBP', '')
+        self.sizes = sizes
+        self.complete = complete
+
+
+def formats():
+    """Форматы вариантов: основной и WebP, если его умеет Pillow."""
+    base = thumbnail_settings.THUMBNAIL_FORMAT
+    if settings.THUMBNAIL_WEBP and WEBP_SUPPORTED and base != 'WEBP':
+        return [base, 'WEBP']
+    return [base]
+
+
+def variants(name):
+    """Варианты пресета name; основной — полной ширины в основном формате."""
+    config = dict(settings.THUMBNAIL_PRESETS[name])
+    config.pop('sizes', None)
+    widths = config.pop('widths', ())
+    width, height = parse_geometry(config.pop('geometry'))
+    base = thumbnail_settings.THUMBNAIL_FORMAT
+    result = []
+    for image_format in formats():
+        # Формат основного варианта не указываем: так имя файла совпадает
+        # с миниатюрами, сделанными до появления вариантов.
+        options = (
+            config if image_format == base
+            else dict(config, format=image_format)
+        )
+        for variant_width in sorted({width, *widths}):
+            geometry = str(variant_width)
+            if height:
+                geometry += f'x{round(height * variant_width / width)}'
+            result.append(Variant(
+                variant_width, image_format, geometry, dict(options),
+                main=image_format == base and variant_width == width,
+            ))
+    return result
+
+
+def placeholder(post, name):
+    """Заглушка размера миниатюры; без высоты в пресете — по пропорциям
+    картинки, сохранённым в посте."""
+    geometry = settings.THUMBNAIL_PRESETS[name]['geometry']
+    width, height = parse_geometry(geometry)
+    if not height:
+        height = width
+        if post.image_width and post.image_height:
+            height = round(width * post.image_height / post.image_width)
+    return Placeholder(width, height)
+
+
+def _picture(variants, found, sizes):
+    """Picture из найденных файлов; None, если нет основного."""
+    ready = [
+        (variant, file) for variant, file in zip(variants, found) if file
+    ]
+    main = next((file for variant, file in ready if variant.main), None)
+    if main is None:
+        return None
+    srcsets = {}
+    for variant, file in ready:
+        srcsets.setdefault(variant.format, []).append(
+            f'{file.url} {file.width}w'
+        )
+    return Picture(
+        main,
+        {image_format: ', '.join(items)
+         for image_format, items in srcsets.items()},
+        sizes,
+        complete=len(ready) == len(variants),
+    )
+
+
+def resolve(images, name):
+    """Picture или None для каждой картинки; все ключи — одним lookup."""
+    preset_variants = variants(name)
+    sizes = settings.THUMBNAIL_PRESETS[name].get('sizes', '')
+    found = lookup_many([
+        thumbnail_file(image, variant.geometry, **variant.options)
+        for image in images
+        for variant in preset_variants
+    ])
+    count = len(preset_variants)
+    return [
+        _picture(preset_variants, found[i * count:(i + 1) * count], sizes)
+        for i in range(len(images))
+    ]
+
+
+def cached_thumbnail(image, name):
+    """Готовые файлы пресета или None, если основной ещё не сделан."""
+    return resolve([image], name)[0]
+
+
+def prefetch(posts, name):
+    """Миниатюры пресета name для всех постов страницы одним обращением.
+
+    Результат лежит в post.thumbnails, откуда его берёт тег
+    thumbnail_preset, не трогая хранилище ключей.
+    """
+    posts = [post for post in posts if post.image]
+    if not posts:
+        return
+    found = resolve([post.image for post in posts], name)
+    for post, thumbnail in zip(posts, found):
+        if not hasattr(post, 'thumbnails'):
+            post.thumbnails = {}
+        post.thumbnails[name] = thumbnail
+
+
+def generate(image_name):
+    """Делает миниатюры всех пресетов и сбрасывает кэш постов с картинкой."""
+    for name in settings.THUMBNAIL_PRESETS:
+        for variant in variants(name):
+            get_thumbnail(image_name, variant.geometry, **variant.options)
+    posts = list(Post.objects.filter(image=image_name).values_list(
+        'pk', 'author_id', 'group_id'
+    ))
+    if posts:
+        post_ids, author_ids, group_ids = zip(*posts)
+        cache.invalidate_cards(post_ids)
+        cache.invalidate_posts(author_ids, group_ids, post_ids)
+
+
+def schedule(image_name):
+    tasks.submit(generate, image_name)
@@ -0,0 +1,76 @@
+"""Материализованная лента подписок (fan-out on write).
+
+Каждый подписчик автора получает в свою ленту ссылку на пост в момент
+публикации, поэтому страница подписок читается одним проходом по индексу
+(user, -pub_date) вместо join через Follow.
+"""
+from django.db import connection
+from django.db.models import F
+
+from .models import Follow, Post, TimelineEntry
+
+FEED_ORDERING = ('-feed_date', '-feed_post')
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+            for user_id in followers
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту пользователя все посты нового автора."""
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).values_list('id', 'pub_date').order_by()
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+            for post_id, pub_date in posts.iterator()
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def trim(user_id, author_id):
+    """Убирает из ленты пользователя посты автора после отписки."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def rebuild_all():
+    """Дополняет ленты всех подписчиков одним INSERT ... SELECT.
+
+    Нужен после массовой загрузки, которая обходит сигналы fan-out.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {TimelineEntry._meta.db_table} '
+            '(user_id, post_id, pub_date) '
+            'SELECT f.user_id, p.id, p.pub_date '
+            f'FROM {Follow._meta.db_table} f '
+            f'JOIN {Post._meta.db_table} p ON p.author_id = f.author_id '
+            'WHERE NOT EXISTS (SELECT 1 '
+            f'FROM {TimelineEntry._meta.db_table} t '
+            'WHERE t.user_id = f.user_id AND t.post_id = p.id)'
+        )
+        return cursor.rowcount
+
+
+def get_feed(user):
+    """Посты ленты подписок, упорядоченные по индексу ленты."""
+    return Post.objects.filter(
+        timeline_entries__user=user
+    ).annotate(
+        feed_date=F('timeline_entries__pub_date'),
+        feed_post=F('timeline_entries__post_id'),
+    ).order_by(*FEED_ORDERING)
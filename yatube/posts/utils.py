@@ -0,0 +1,63 @@
+from django.conf import settings
+from django.core.paginator import Paginator
+
+from core.paginators import CachedCountPaginator, CursorPaginator
+
+from . import cache, thumbnails
+from .search import SEARCH_ORDERING
+
+POST_ORDERING = ('-pub_date', '-id')
+COMMENT_ORDERING = ('-created', '-id')
+
+
+def paginate(request, queryset, ordering=POST_ORDERING, get_count=None,
+             show_author=True):
+    """Страница постов: нумерованная или по курсору (?cursor=...).
+
+    get_count подменяет COUNT(*) нумерованного пагинатора кэшированным
+    счётчиком. Миниатюры карточек страницы находятся одним запросом;
+    show_author — вид карточек в шаблоне.
+    """
+    cursor = request.GET.get('cursor')
+    if cursor is not None or settings.POSTS_PAGINATION == 'cursor':
+        paginator = CursorPaginator(
+            queryset, settings.NUMBER_OF_POSTS, ordering
+        )
+        return _with_thumbnails(paginator.get_page(cursor), show_author)
+    if get_count is not None:
+        paginator = CachedCountPaginator(
+            queryset, settings.NUMBER_OF_POSTS, get_count
+        )
+    else:
+        paginator = Paginator(queryset, settings.NUMBER_OF_POSTS)
+    return _with_thumbnails(
+        paginator.get_page(request.GET.get('page')), show_author
+    )
+
+
+def _with_thumbnails(page, show_author=True):
+    # Карточки из кэша миниатюры не читают: ищем только для остальных.
+    posts = [post for post in page if post.image]
+    cached = cache.cached_cards([post.pk for post in posts], show_author)
+    thumbnails.prefetch(
+        [post for post in posts if post.pk not in cached], 'card'
+    )
+    return page
+
+
+def paginate_comments(queryset, cursor=None):
+    """Страница комментариев по курсору на (created, id)."""
+    paginator = CursorPaginator(
+        queryset.select_related('author').defer('text'),
+        settings.COMMENTS_PER_PAGE,
+        COMMENT_ORDERING,
+    )
+    return paginator.get_page(cursor)
+
+
+def paginate_search(queryset, cursor=None):
+    """Страница результатов поиска по курсору на (rank, id)."""
+    paginator = CursorPaginator(
+        queryset, settings.NUMBER_OF_POSTS, SEARCH_ORDERING
+    )
+    return _with_thumbnails(paginator.get_page(cursor))
@@ -52,8 +52,13 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.db_router.ReplicaMiddleware',
 ]
 
+if DEBUG:
+    # Предупреждает, когда представление превышает @query_budget.
+    MIDDLEWARE.append('core.query_budget.QueryBudgetMiddleware')
+
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
@@ -88,6 +93,23 @@ DATABASES = {
     }
 }
 
+# PRAGMA для каждого нового соединения с SQLite (см. core/db.py).
+# journal_mode идёт первым: остальные значения рассчитаны на WAL.
+SQLITE_PRODUCTION_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+}
+SQLITE_PRAGMAS = {}
+
+# Представления с @read_replica читают с алиаса 'replica', если он задан.
+# REPLICA_LAG — на сколько секунд реплика может отставать: столько же
+# автор изменения читает с основной базы (см. core/db_router.py).
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+REPLICA_LAG = 10
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -139,6 +161,69 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 NUMBER_OF_POSTS = 10
 
+# Сколько символов текста поста показывать в карточке ленты; полный текст
+# читает только страница поста.
+POST_EXCERPT_LENGTH = 500
+
+# Комментарии под постом: первая страница в самой странице, следующие
+# подгружаются фрагментами.
+COMMENTS_PER_PAGE = 20
+
+# Выгрузка постов и комментариев читает базу пачками такого размера.
+EXPORT_CHUNK_SIZE = 1000
+
+# Миниатюры картинок постов: шаблоны ссылаются на пресет по имени.
+# geometry — основной размер, widths — дополнительные ширины для srcset
+# с теми же пропорциями, sizes — атрибут sizes для браузера; остальные
+# ключи передаются в sorl-thumbnail.
+THUMBNAIL_PRESETS = {
+    'card': {
+        'geometry': '960x339', 'crop': 'center', 'upscale': True,
+        'widths': (320, 640),
+        'sizes': '(max-width: 992px) 100vw, 960px',
+    },
+    'detail': {
+        'geometry': '960x339', 'crop': 'center', 'upscale': True,
+        'widths': (320, 640),
+        'sizes': '(max-width: 768px) 100vw, 25vw',
+    },
+}
+
+# Загрузки пишутся на диск кусками, файл больше UPLOAD_MAX_BYTES
+# отклоняется. Картинка больше UPLOAD_IMAGE_MAX_PIXELS не декодируется,
+# остальные уменьшаются до UPLOAD_IMAGE_MAX_SIDE по большей стороне и
+# сохраняются без метаданных.
+FILE_UPLOAD_HANDLERS = ['core.uploads.LimitedUploadHandler']
+UPLOAD_MAX_BYTES = 10 * 1024 * 1024
+UPLOAD_IMAGE_MAX_PIXELS = 40 * 10 ** 6
+UPLOAD_IMAGE_MAX_SIDE = 2560
+UPLOAD_IMAGE_QUALITY = 90
+
+# Превью картинки поста (LQIP): размер по большей стороне и качество JPEG.
+IMAGE_LQIP_SIZE = 16
+IMAGE_LQIP_QUALITY = 40
+
+# Варианты миниатюр в WebP; делаются, только если Pillow собран с WebP.
+THUMBNAIL_WEBP = True
+
+# Потоки для фоновых задач процесса (генерация миниатюр).
+BACKGROUND_WORKERS = 2
+
+# Выполнять фоновые задачи сразу после коммита в текущем потоке. Включает
+# его запуск тестов (core.testing.TestRunner и фикстура pytest).
+BACKGROUND_TASKS_EAGER = False
+
+TEST_RUNNER = 'core.testing.TestRunner'
+
+# 'pages' — нумерованные страницы (?page=N), 'cursor' — keyset-пагинация
+# (?cursor=...), цена которой не зависит от глубины листания.
+POSTS_PAGINATION = 'pages'
+
+# Общее число постов для пагинации главной живёт в кэше и поддерживается
+# сигналами; выше порога оно оценивается по диапазону первичного ключа.
+POSTS_COUNT_TIMEOUT = 60 * 60 * 24
+POSTS_COUNT_ESTIMATE_THRESHOLD = 100_000
+
 ALLOWED_HOSTS = [
     'localhost',
     '127.0.0.1',
@@ -155,4 +240,45 @@ CACHES = {
     }
 }
 
+if not DEBUG:
+    # WAL, mmap и busy_timeout; соединение живёт между запросами.
+    SQLITE_PRAGMAS = SQLITE_PRODUCTION_PRAGMAS
+    DATABASES['default']['CONN_MAX_AGE'] = 600
+    DATABASES['default']['OPTIONS'] = {'timeout': 5}
+    # Локальная реплика: копия файла, которую обновляет sync_replica.
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.path.join(BASE_DIR, 'db.replica.sqlite3'),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+    # Один кэш на все воркеры: файл SQLite в режиме WAL с L1 в памяти.
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache_backends.SQLiteCache',
+            'LOCATION': os.path.join(BASE_DIR, 'cache', 'cache.sqlite3'),
+            'OPTIONS': {
+                'MAX_ENTRIES': 100_000,
+                'L1_TIMEOUT': 1,
+                'L1_MAX_ENTRIES': 2000,
+            },
+        }
+    }
+
+# Страницы сбрасываются сигналами при изменении постов и групп, поэтому
+# их можно держать в кэше долго. После PAGE_CACHE_TIMEOUT страница ещё
+# PAGE_CACHE_STALE_TIMEOUT отдаётся устаревшей, пока один запрос её
+# пересобирает; BETA включает вероятностное обновление до истечения.
+PAGE_CACHE_TIMEOUT = 60 * 60 * 4
+PAGE_CACHE_STALE_TIMEOUT = 60 * 10
+PAGE_CACHE_LOCK_TIMEOUT = 30
+PAGE_CACHE_LOCK_WAIT = 2
+PAGE_CACHE_EARLY_REFRESH_BETA = 1.0
+# Версии областей живут дольше страниц, но не вечно: иначе запросы к
+# несуществующим адресам копили бы в кэше ключи версий без конца.
+PAGE_VERSION_TIMEOUT = 60 * 60 * 24
+
+# Готовые карточки постов сбрасываются при правке поста или его группы.
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'